@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from .metrics import CACHE_REQUESTS, STAGE_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: the cache is only safe within one process.
+    fcntl = None
+
+_SIDECAR_SUFFIX = ".json"
+_TMP_DIR = ".tmp"
+# Keys as built by downloader.cache_key; the sweep leaves other files alone.
+_KEY_PATTERN = re.compile(r"[\w-]+-[0-9a-f]{10}")
+# Leftovers of interrupted writes: half-written sidecars and yt-dlp partials.
+_PARTIAL_SUFFIXES = (".tmp", ".part", ".ytdl")
+# Kept free on the volume beyond every reservation.
+MIN_FREE_BYTES = 256 * 1024 * 1024
+SPACE_RECHECK_SECONDS = 5
+# Partial downloads older than this are removed at startup.
+PARTIAL_MAX_AGE_SECONDS = 24 * 60 * 60
+
+
+class DiskBudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    path: Path
+    size: int
+    info: dict
+    pins: int = 0
+    # Open while pinned, holding a shared lock other processes can see.
+    lock_file: Optional[object] = None
+
+
+class DownloadCache:
+    """LRU cache of downloaded videos; pinned files are never evicted, even by other processes."""
+
+    def __init__(self, root: Path, max_bytes: int, budget_bytes: int = 0) -> None:
+        self.root = root
+        self.max_bytes = max(0, max_bytes)
+        self.budget_bytes = max(0, budget_bytes)
+        self._lock = threading.Lock()
+        self._space_freed = threading.Condition(self._lock)
+        self._reserved = 0
+        # Pins held by callers waiting in reserve(); they cannot free space.
+        self._waiting_pins: Counter[Path] = Counter()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._by_path: dict[Path, CacheEntry] = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._sweep()
+        self._load()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values())
+
+    @property
+    def reserved_bytes(self) -> int:
+        return self._reserved
+
+    @contextmanager
+    def reserve(self, nbytes: int, holding: Iterable[Path] = ()) -> Iterator[None]:
+        """Hold ``nbytes`` of disk space while writing; ``holding`` are the caller's own pins."""
+        nbytes = max(0, nbytes)
+        if self.budget_bytes and nbytes > self.budget_bytes:
+            raise DiskBudgetExceeded(
+                f"needs {nbytes / 2**20:.0f} MiB, more than the download disk budget "
+                f"of {self.budget_bytes / 2**20:.0f} MiB"
+            )
+        held = Counter(holding)
+        started = time.monotonic()
+        waiting = False
+        with self._space_freed:
+            try:
+                while True:
+                    shortfall = self._shortfall_locked(nbytes)
+                    if shortfall > 0:
+                        self._evict_locked(shortfall)
+                        shortfall = self._shortfall_locked(nbytes)
+                    if shortfall <= 0:
+                        break
+                    if not waiting:
+                        waiting = True
+                        self._waiting_pins.update(held)
+                        # Other waiters re-check: these pins no longer count.
+                        self._space_freed.notify_all()
+                        logging.info(
+                            "Waiting for %.0f MiB of disk space (%.0f MiB reserved)",
+                            shortfall / 2**20,
+                            self._reserved / 2**20,
+                        )
+                    if not self._may_free_locked():
+                        raise DiskBudgetExceeded(
+                            f"needs {nbytes / 2**20:.0f} MiB of disk space, "
+                            f"{shortfall / 2**20:.0f} MiB more than is available"
+                        )
+                    self._space_freed.wait(SPACE_RECHECK_SECONDS)
+            finally:
+                if waiting:
+                    self._waiting_pins -= held
+            self._reserved += nbytes
+        if waiting:
+            STAGE_SECONDS.observe(time.monotonic() - started, stage="disk_wait", platform="")
+        try:
+            yield
+        finally:
+            with self._space_freed:
+                self._reserved -= nbytes
+                self._space_freed.notify_all()
+
+    def _may_free_locked(self) -> bool:
+        """Whether a reservation or a pin that is not waiting may still free space."""
+        if self._reserved:
+            return True
+        # Our own pins hold a shared lock too, so only unpinned files are probed.
+        return any(
+            entry.pins > self._waiting_pins[entry.path]
+            if entry.pins
+            else self._in_use_elsewhere(entry)
+            for entry in self._entries.values()
+        )
+
+    def _shortfall_locked(self, nbytes: int) -> int:
+        shortfall = 0
+        if self.budget_bytes:
+            used = sum(entry.size for entry in self._entries.values()) + self._reserved
+            shortfall = used + nbytes - self.budget_bytes
+        # Reserved bytes are not written yet, so not yet missing from free space.
+        free = shutil.disk_usage(self.root).free - self._reserved - MIN_FREE_BYTES
+        return max(shortfall, nbytes - free)
+
+    def get_or_create(
+        self, key: str, produce: Callable[[Path], tuple[Path, dict]]
+    ) -> CacheEntry:
+        """Return the pinned entry for ``key``; ``produce(tmp_dir)`` makes it on a miss."""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock, self._producing(key):
+            entry = self.acquire(key) or self._adopt(key)
+            if entry is not None:
+                CACHE_REQUESTS.inc(result="hit")
+                return entry
+            CACHE_REQUESTS.inc(result="miss")
+
+            # The per-key temp dir keeps partial files for the next attempt.
+            tmp_dir = self.root / _TMP_DIR / key
+            tmp_dir.mkdir(parents=True, exist_ok=True)
+            produced_path, info = produce(tmp_dir)
+            final_path = self.root / f"{key}{produced_path.suffix}"
+            os.replace(produced_path, final_path)
+            self._write_sidecar(key, final_path, info)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+            entry = CacheEntry(
+                key=key,
+                path=final_path,
+                size=final_path.stat().st_size,
+                info=info,
+                pins=1,
+            )
+            self._lock_shared(entry)
+            with self._lock:
+                self._entries[key] = entry
+                self._by_path[final_path] = entry
+                self._evict_locked()
+            return entry
+
+    def acquire(self, key: str) -> Optional[CacheEntry]:
+        """Pin and return the entry for ``key`` if it is cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not entry.path.exists():
+                self._drop_locked(entry)
+                return None
+            entry.pins += 1
+            if entry.pins == 1:
+                self._lock_shared(entry)
+            self._entries.move_to_end(key)
+        try:
+            # The mtime carries the LRU order over restarts.
+            os.utime(entry.path)
+        except OSError:
+            pass
+        return entry
+
+    def pin(self, path: Path) -> Optional[CacheEntry]:
+        """Pin the cached file at ``path``; None if it is no longer cached."""
+        key = path.name.split(".", 1)[0]
+        entry = self.acquire(key) or self._adopt(key)
+        if entry is not None and entry.path != path:
+            self.release(entry.path)
+            return None
+        return entry
+
+    def release(self, path: Path) -> None:
+        """Unpin the entry stored at ``path`` and evict if over budget."""
+        with self._lock:
+            entry = self._by_path.get(path)
+            if entry is None:
+                return
+            entry.pins = max(0, entry.pins - 1)
+            if not entry.pins and entry.lock_file is not None:
+                entry.lock_file.close()
+                entry.lock_file = None
+            self._evict_locked()
+            self._space_freed.notify_all()
+
+    def _evict_locked(self, needed: int = 0) -> None:
+        """Evict released entries, oldest first, to fit ``max_bytes`` and free ``needed``."""
+        total = sum(entry.size for entry in self._entries.values())
+        for entry in list(self._entries.values()):
+            if total <= self.max_bytes and needed <= 0:
+                break
+            if entry.pins or self._in_use_elsewhere(entry):
+                continue
+            self._drop_locked(entry)
+            total -= entry.size
+            needed -= entry.size
+            logging.info("Evicted cached download: %s", entry.path)
+
+    def _drop_locked(self, entry: CacheEntry) -> None:
+        self._entries.pop(entry.key, None)
+        self._by_path.pop(entry.path, None)
+        self._sidecar_path(entry.key).unlink(missing_ok=True)
+        entry.path.unlink(missing_ok=True)
+
+    @contextmanager
+    def _producing(self, key: str) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        lock_path = self.root / _TMP_DIR / f"{key}.lock"
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            with lock_path.open("a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # The sweep may have removed the lock file while this process waited.
+                try:
+                    current = os.stat(lock_path).st_ino
+                except FileNotFoundError:
+                    continue
+                if current != os.fstat(lock_file.fileno()).st_ino:
+                    continue
+                yield
+                return
+
+    def _lock_shared(self, entry: CacheEntry) -> None:
+        if fcntl is None:
+            return
+        try:
+            lock_file = entry.path.open("rb")
+        except OSError:
+            return
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        entry.lock_file = lock_file
+
+    def _in_use_elsewhere(self, entry: CacheEntry) -> bool:
+        """Whether another process holds ``entry`` pinned."""
+        if fcntl is None:
+            return False
+        try:
+            with entry.path.open("rb") as probe:
+                fcntl.flock(probe, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def _adopt(self, key: str) -> Optional[CacheEntry]:
+        """Pin an entry another process added after this cache was loaded."""
+        entry = self._read_sidecar(self._sidecar_path(key))
+        if entry is None:
+            return None
+        with self._lock:
+            self._entries[key] = entry
+            self._by_path[entry.path] = entry
+        return self.acquire(key)
+
+    def _read_sidecar(self, sidecar: Path) -> Optional[CacheEntry]:
+        try:
+            text = sidecar.read_text()
+        except FileNotFoundError:
+            return None
+        try:
+            data = json.loads(text)
+            file_path = self.root / data["file"]
+            stat = file_path.stat()
+        except (OSError, ValueError, KeyError):
+            sidecar.unlink(missing_ok=True)
+            return None
+        key = sidecar.name[: -len(_SIDECAR_SUFFIX)]
+        return CacheEntry(key=key, path=file_path, size=stat.st_size, info=data.get("info") or {})
+
+    def _sidecar_path(self, key: str) -> Path:
+        return self.root / f"{key}{_SIDECAR_SUFFIX}"
+
+    def _write_sidecar(self, key: str, file_path: Path, info: dict) -> None:
+        sidecar = self._sidecar_path(key)
+        tmp_path = sidecar.with_name(f"{sidecar.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps({"file": file_path.name, "info": info}))
+        os.replace(tmp_path, sidecar)
+
+    def _sweep(self) -> None:
+        """Remove what crashed producers left behind, skipping keys still being produced."""
+        tmp_root = self.root / _TMP_DIR
+        cutoff = time.time() - PARTIAL_MAX_AGE_SECONDS
+        removed = 0
+        for path in self.root.iterdir():
+            if path.is_dir() or path.name.endswith(_SIDECAR_SUFFIX):
+                continue
+            key = path.name.split(".")[0]
+            if not _KEY_PATTERN.fullmatch(key):
+                continue
+            half_written = path.name.endswith(_PARTIAL_SUFFIXES)
+            if not half_written and self._sidecar_path(key).exists():
+                continue
+            with self._unless_producing(key) as idle:
+                # Checked again under the lock: the producer may just have finished.
+                if idle and (half_written or not self._sidecar_path(key).exists()):
+                    path.unlink(missing_ok=True)
+                    removed += 1
+        if tmp_root.is_dir():
+            for path in tmp_root.iterdir():
+                if not path.is_dir():
+                    continue
+                try:
+                    if path.stat().st_mtime >= cutoff:
+                        continue
+                except OSError:
+                    continue
+                with self._unless_producing(path.name) as idle:
+                    if idle:
+                        shutil.rmtree(path, ignore_errors=True)
+                        removed += 1
+            for lock_path in tmp_root.glob("*.lock"):
+                key = lock_path.name[: -len(".lock")]
+                if (tmp_root / key).exists():
+                    continue
+                with self._unless_producing(key) as idle:
+                    if idle:
+                        lock_path.unlink(missing_ok=True)
+        if removed:
+            logging.info("Removed %d leftover file(s) from %s", removed, self.root)
+
+    @contextmanager
+    def _unless_producing(self, key: str) -> Iterator[bool]:
+        """Yield whether no process produces ``key``, keeping it that way meanwhile."""
+        lock_path = self.root / _TMP_DIR / f"{key}.lock"
+        if fcntl is None or not lock_path.exists():
+            yield True
+            return
+        try:
+            lock_file = lock_path.open("a")
+        except OSError:
+            yield False
+            return
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+
+    def _load(self) -> None:
+        loaded = []
+        for sidecar in self.root.glob(f"*{_SIDECAR_SUFFIX}"):
+            entry = self._read_sidecar(sidecar)
+            if entry is None:
+                continue
+            try:
+                loaded.append((entry.path.stat().st_mtime, entry))
+            except OSError:
+                continue
+
+        for _, entry in sorted(loaded, key=lambda item: item[0]):
+            self._entries[entry.key] = entry
+            self._by_path[entry.path] = entry
+
+        with self._lock:
+            self._evict_locked()
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Mapping, Optional
 import os
 
 
@@ -8,6 +9,12 @@ def _get_bool(value: str, default: bool) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "y"}
 
 
+def _get_int(value: str, default: int) -> int:
+    if value is None or not value.strip():
+        return default
+    return int(value.strip())
+
+
 @dataclass(frozen=True)
 class Config:
     telegram_bot_token: str
@@ -23,11 +30,14 @@ class Config:
     youtube_category_id: str
     youtube_made_for_kids: bool
     youtube_oauth_flow: str
+    youtube_upload_chunk_size: int
+    youtube_upload_retries: int
     tiktok_access_token: str
     tiktok_privacy_level: str
     tiktok_disable_comment: bool
     tiktok_disable_duet: bool
     tiktok_disable_stitch: bool
+    tiktok_upload_parallel_chunks: int
     instagram_username: str
     instagram_password: str
     instagram_session_id: str
@@ -37,78 +47,209 @@ class Config:
     instagram_graph_access_token: str
     instagram_graph_ig_user_id: str
     instagram_graph_video_url_template: str
+    media_server_public_url: str
+    media_server_host: str
+    media_server_port: int
+    media_server_secret: str
     download_dir: str
     allow_duplicate_uploads: bool
+    job_concurrency: int
+    job_queue_size: int
+    upload_timeout_seconds: int
+    status_poll_concurrency: int
+    upload_retries: int
+    circuit_breaker_threshold: int
+    circuit_breaker_reset_seconds: int
+    job_db_path: str
+    download_cache_max_bytes: int
+    download_disk_budget_bytes: int
+    bulk_max_videos: int
+    youtube_daily_quota: int
+    youtube_upload_quota_cost: int
+    tiktok_daily_uploads: int
+    instagram_daily_uploads: int
+    upload_burst: int
+    metrics_host: str
+    metrics_port: int
+    media_prep: bool
+    telegram_mode: str
+    telegram_webhook_url: str
+    telegram_webhook_path: str
+    telegram_webhook_host: str
+    telegram_webhook_port: int
+    telegram_webhook_secret: str
+    status_edit_interval_seconds: int
+    routes_path: str
+    job_runner: str
+    job_lease_seconds: int
 
     @staticmethod
-    def from_env() -> "Config":
-        bot_token = os.environ.get("TELEGRAM_BOT_TOKEN", "").strip()
-        channel_id_raw = os.environ.get("TELEGRAM_CHANNEL_ID", "").strip()
+    def from_env(environ: Optional[Mapping[str, str]] = None) -> "Config":
+        env = os.environ if environ is None else environ
+        bot_token = env.get("TELEGRAM_BOT_TOKEN", "").strip()
+        channel_id_raw = env.get("TELEGRAM_CHANNEL_ID", "").strip()
         if not bot_token or not channel_id_raw:
             raise ValueError("Missing TELEGRAM_BOT_TOKEN or TELEGRAM_CHANNEL_ID.")
 
+        telegram_mode = env.get("TELEGRAM_MODE", "polling").strip().lower()
+        if telegram_mode not in {"polling", "webhook"}:
+            raise ValueError(f"Unsupported TELEGRAM_MODE={telegram_mode}.")
+        webhook_url = env.get("TELEGRAM_WEBHOOK_URL", "").strip()
+        if telegram_mode == "webhook" and not webhook_url:
+            raise ValueError("TELEGRAM_MODE=webhook requires TELEGRAM_WEBHOOK_URL.")
+        webhook_secret = env.get("TELEGRAM_WEBHOOK_SECRET", "").strip()
+        if telegram_mode == "webhook" and not webhook_secret:
+            # A generated secret would differ per start and per instance.
+            raise ValueError("TELEGRAM_MODE=webhook requires TELEGRAM_WEBHOOK_SECRET.")
+        webhook_path = env.get("TELEGRAM_WEBHOOK_PATH", "/telegram").strip()
+        job_runner = env.get("JOB_RUNNER", "local").strip().lower()
+        if job_runner not in {"local", "workers"}:
+            raise ValueError(f"Unsupported JOB_RUNNER={job_runner}.")
+        if (
+            job_runner == "workers"
+            and env.get("MEDIA_SERVER_PUBLIC_URL", "").strip()
+            and not env.get("MEDIA_SERVER_SECRET", "").strip()
+        ):
+            # Workers sign the URLs the bot process serves.
+            raise ValueError(
+                "JOB_RUNNER=workers with MEDIA_SERVER_PUBLIC_URL requires MEDIA_SERVER_SECRET."
+            )
+        instagram_upload_method = env.get(
+            "INSTAGRAM_UPLOAD_METHOD", "instagrapi"
+        ).strip().lower()
+        if instagram_upload_method not in {"instagrapi", "graph"}:
+            raise ValueError(f"Unsupported INSTAGRAM_UPLOAD_METHOD={instagram_upload_method}.")
+
         return Config(
             telegram_bot_token=bot_token,
             telegram_channel_id=int(channel_id_raw),
             enable_youtube_upload=_get_bool(
-                os.environ.get("ENABLE_YOUTUBE_UPLOAD"), True
+                env.get("ENABLE_YOUTUBE_UPLOAD"), True
             ),
             enable_tiktok_upload=_get_bool(
-                os.environ.get("ENABLE_TIKTOK_UPLOAD"), False
+                env.get("ENABLE_TIKTOK_UPLOAD"), False
             ),
             enable_instagram_upload=_get_bool(
-                os.environ.get("ENABLE_INSTAGRAM_UPLOAD"), False
+                env.get("ENABLE_INSTAGRAM_UPLOAD"), False
             ),
-            youtube_client_secrets_path=os.environ.get(
+            youtube_client_secrets_path=env.get(
                 "YOUTUBE_CLIENT_SECRETS_PATH", "credentials.json"
             ),
-            youtube_token_path=os.environ.get("YOUTUBE_TOKEN_PATH", "token.json"),
-            youtube_privacy_status=os.environ.get("YOUTUBE_PRIVACY_STATUS", "public"),
-            youtube_title_prefix=os.environ.get("YOUTUBE_TITLE_PREFIX", ""),
-            youtube_description_suffix=os.environ.get(
+            youtube_token_path=env.get("YOUTUBE_TOKEN_PATH", "token.json"),
+            youtube_privacy_status=env.get("YOUTUBE_PRIVACY_STATUS", "public"),
+            youtube_title_prefix=env.get("YOUTUBE_TITLE_PREFIX", ""),
+            youtube_description_suffix=env.get(
                 "YOUTUBE_DESCRIPTION_SUFFIX", "#shorts"
             ),
-            youtube_category_id=os.environ.get("YOUTUBE_CATEGORY_ID", "22"),
+            youtube_category_id=env.get("YOUTUBE_CATEGORY_ID", "22"),
             youtube_made_for_kids=_get_bool(
-                os.environ.get("YOUTUBE_MADE_FOR_KIDS"), False
+                env.get("YOUTUBE_MADE_FOR_KIDS"), False
+            ),
+            youtube_oauth_flow=env.get("YOUTUBE_OAUTH_FLOW", "local_server"),
+            youtube_upload_chunk_size=max(
+                1,
+                _get_int(env.get("YOUTUBE_UPLOAD_CHUNK_SIZE"), 8 * 1024 * 1024),
             ),
-            youtube_oauth_flow=os.environ.get("YOUTUBE_OAUTH_FLOW", "local_server"),
-            tiktok_access_token=os.environ.get("TIKTOK_ACCESS_TOKEN", "").strip(),
-            tiktok_privacy_level=os.environ.get(
+            youtube_upload_retries=max(
+                0, _get_int(env.get("YOUTUBE_UPLOAD_RETRIES"), 5)
+            ),
+            tiktok_access_token=env.get("TIKTOK_ACCESS_TOKEN", "").strip(),
+            tiktok_privacy_level=env.get(
                 "TIKTOK_PRIVACY_LEVEL", "PUBLIC_TO_EVERYONE"
             ),
             tiktok_disable_comment=_get_bool(
-                os.environ.get("TIKTOK_DISABLE_COMMENT"), False
+                env.get("TIKTOK_DISABLE_COMMENT"), False
             ),
             tiktok_disable_duet=_get_bool(
-                os.environ.get("TIKTOK_DISABLE_DUET"), False
+                env.get("TIKTOK_DISABLE_DUET"), False
             ),
             tiktok_disable_stitch=_get_bool(
-                os.environ.get("TIKTOK_DISABLE_STITCH"), False
+                env.get("TIKTOK_DISABLE_STITCH"), False
+            ),
+            tiktok_upload_parallel_chunks=max(
+                1, _get_int(env.get("TIKTOK_UPLOAD_PARALLEL_CHUNKS"), 1)
             ),
-            instagram_username=os.environ.get("INSTAGRAM_USERNAME", "").strip(),
-            instagram_password=os.environ.get("INSTAGRAM_PASSWORD", "").strip(),
-            instagram_session_id=os.environ.get("INSTAGRAM_SESSION_ID", "").strip(),
-            instagram_session_path=os.environ.get(
+            instagram_username=env.get("INSTAGRAM_USERNAME", "").strip(),
+            instagram_password=env.get("INSTAGRAM_PASSWORD", "").strip(),
+            instagram_session_id=env.get("INSTAGRAM_SESSION_ID", "").strip(),
+            instagram_session_path=env.get(
                 "INSTAGRAM_SESSION_PATH", "instagram_session.json"
             ),
-            instagram_caption_suffix=os.environ.get(
+            instagram_caption_suffix=env.get(
                 "INSTAGRAM_CAPTION_SUFFIX", "#reels"
             ),
-            instagram_upload_method=os.environ.get(
-                "INSTAGRAM_UPLOAD_METHOD", "instagrapi"
-            ).strip().lower(),
-            instagram_graph_access_token=os.environ.get(
+            instagram_upload_method=instagram_upload_method,
+            instagram_graph_access_token=env.get(
                 "INSTAGRAM_GRAPH_ACCESS_TOKEN", ""
             ).strip(),
-            instagram_graph_ig_user_id=os.environ.get(
+            instagram_graph_ig_user_id=env.get(
                 "INSTAGRAM_GRAPH_IG_USER_ID", ""
             ).strip(),
-            instagram_graph_video_url_template=os.environ.get(
+            instagram_graph_video_url_template=env.get(
                 "INSTAGRAM_GRAPH_VIDEO_URL_TEMPLATE", ""
             ).strip(),
-            download_dir=os.environ.get("DOWNLOAD_DIR", "downloads"),
+            media_server_public_url=env.get("MEDIA_SERVER_PUBLIC_URL", "").strip(),
+            media_server_host=env.get("MEDIA_SERVER_HOST", "0.0.0.0").strip(),
+            media_server_port=_get_int(env.get("MEDIA_SERVER_PORT"), 8080),
+            media_server_secret=env.get("MEDIA_SERVER_SECRET", "").strip(),
+            download_dir=env.get("DOWNLOAD_DIR", "downloads"),
             allow_duplicate_uploads=_get_bool(
-                os.environ.get("ALLOW_DUPLICATE_UPLOADS"), False
+                env.get("ALLOW_DUPLICATE_UPLOADS"), False
+            ),
+            job_concurrency=max(1, _get_int(env.get("JOB_CONCURRENCY"), 2)),
+            job_queue_size=max(0, _get_int(env.get("JOB_QUEUE_SIZE"), 20)),
+            upload_timeout_seconds=max(
+                1, _get_int(env.get("UPLOAD_TIMEOUT_SECONDS"), 1800)
+            ),
+            status_poll_concurrency=max(
+                1, _get_int(env.get("STATUS_POLL_CONCURRENCY"), 4)
+            ),
+            upload_retries=max(0, _get_int(env.get("UPLOAD_RETRIES"), 2)),
+            circuit_breaker_threshold=max(
+                1, _get_int(env.get("CIRCUIT_BREAKER_THRESHOLD"), 5)
+            ),
+            circuit_breaker_reset_seconds=max(
+                1, _get_int(env.get("CIRCUIT_BREAKER_RESET_SECONDS"), 300)
+            ),
+            job_db_path=env.get("JOB_DB_PATH", "jobs.sqlite3"),
+            download_cache_max_bytes=max(
+                0,
+                _get_int(
+                    env.get("DOWNLOAD_CACHE_MAX_BYTES"), 2 * 1024 * 1024 * 1024
+                ),
+            ),
+            download_disk_budget_bytes=max(
+                0, _get_int(env.get("DOWNLOAD_DISK_BUDGET_BYTES"), 0)
+            ),
+            bulk_max_videos=max(1, _get_int(env.get("BULK_MAX_VIDEOS"), 50)),
+            youtube_daily_quota=max(
+                0, _get_int(env.get("YOUTUBE_DAILY_QUOTA"), 10000)
+            ),
+            youtube_upload_quota_cost=max(
+                1, _get_int(env.get("YOUTUBE_UPLOAD_QUOTA_COST"), 1600)
+            ),
+            tiktok_daily_uploads=max(
+                0, _get_int(env.get("TIKTOK_DAILY_UPLOADS"), 15)
+            ),
+            instagram_daily_uploads=max(
+                0, _get_int(env.get("INSTAGRAM_DAILY_UPLOADS"), 25)
+            ),
+            upload_burst=max(1, _get_int(env.get("UPLOAD_BURST"), 2)),
+            metrics_host=env.get("METRICS_HOST", "127.0.0.1").strip(),
+            metrics_port=_get_int(env.get("METRICS_PORT"), 0),
+            media_prep=_get_bool(env.get("MEDIA_PREP"), True),
+            telegram_mode=telegram_mode,
+            telegram_webhook_url=webhook_url,
+            telegram_webhook_path="/" + webhook_path.lstrip("/"),
+            telegram_webhook_host=env.get(
+                "TELEGRAM_WEBHOOK_HOST", "0.0.0.0"
+            ).strip(),
+            telegram_webhook_port=_get_int(env.get("TELEGRAM_WEBHOOK_PORT"), 8081),
+            telegram_webhook_secret=webhook_secret,
+            status_edit_interval_seconds=max(
+                1, _get_int(env.get("STATUS_EDIT_INTERVAL_SECONDS"), 3)
             ),
+            routes_path=env.get("ROUTES_PATH", "").strip(),
+            job_runner=job_runner,
+            job_lease_seconds=max(10, _get_int(env.get("JOB_LEASE_SECONDS"), 120)),
         )
@@ -1,34 +1,78 @@
+from __future__ import annotations
+
+from collections import OrderedDict
 from pathlib import Path
-from typing import Tuple
+from typing import TYPE_CHECKING, Callable, Optional, Tuple
+import copy
+import hashlib
+import importlib
+import logging
 import os
+import threading
+import time
+
+if TYPE_CHECKING:
+    from yt_dlp import YoutubeDL
+
+from .cache import DownloadCache
+from .metrics import STAGE_SECONDS, record_transfer
+
+# yt-dlp tries each "/"-separated alternative in order.
+PREFERRED_FORMAT = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best"
+FALLBACK_FORMAT = "bestvideo*+bestaudio*/best"
+FORMAT_SELECTOR = f"{PREFERRED_FORMAT}/{FALLBACK_FORMAT}"
+
+# Info keys kept with a cached download; enough to build titles and captions.
+CACHED_INFO_KEYS = ("id", "title", "description", "duration", "ext", "width", "height")
+# Reserved on top of the estimate, which yt-dlp often only approximates.
+SIZE_MARGIN = 1.1
+# Extracted metadata is reused this long; its format URLs last a few hours.
+METADATA_TTL_SECONDS = 30 * 60
+METADATA_CACHE_SIZE = 256
+# live_status values of videos that cannot be downloaded as a file yet.
+LIVE_STATUSES = {"is_live": "is live right now", "is_upcoming": "has not premiered yet"}
 
-from yt_dlp import YoutubeDL
 
+class VideoUnavailable(RuntimeError):
+    pass
 
-def _download_with_options(url: str, download_dir: Path, ydl_opts: dict) -> Tuple[Path, dict]:
-    with YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=True)
-        file_path = Path(ydl.prepare_filename(info))
 
-    if not file_path.exists() or file_path.stat().st_size == 0:
-        raise RuntimeError("Downloaded file is empty.")
+def estimated_size(info: dict) -> int:
+    """Size of the download from the reported sizes or bitrates; 0 if unknown."""
+    duration = info.get("duration") or 0
+    total = 0
+    for fmt in info.get("requested_formats") or [info]:
+        size = fmt.get("filesize") or fmt.get("filesize_approx")
+        if not size and fmt.get("tbr") and duration:
+            size = fmt["tbr"] * 1000 / 8 * duration
+        total += size or 0
+    return int(total)
 
-    return file_path, info
 
+def expected_size(info: dict) -> int:
+    """Peak disk use of downloading ``info``; merged streams are held twice."""
+    merged = len(info.get("requested_formats") or []) > 1
+    return int(estimated_size(info) * (2 if merged else 1) * SIZE_MARGIN)
 
-def download_short(url: str, download_dir: str) -> Tuple[Path, dict]:
-    download_path = Path(download_dir)
-    download_path.mkdir(parents=True, exist_ok=True)
 
+def cache_key(video_id: str) -> str:
+    format_hash = hashlib.sha1(FORMAT_SELECTOR.encode()).hexdigest()[:10]
+    return f"{video_id}-{format_hash}"
+
+
+def _base_options() -> dict:
     cookies_path = os.environ.get("YTDLP_COOKIES_PATH")
 
     base_opts = {
-        "outtmpl": str(download_path / "%(id)s.%(ext)s"),
+        "outtmpl": "%(id)s.%(ext)s",
+        "format": FORMAT_SELECTOR,
         "noplaylist": True,
         "quiet": True,
         "retries": 3,
         "fragment_retries": 3,
         "concurrent_fragment_downloads": 4,
+        # Pick up .part files and fragments left by an interrupted attempt.
+        "continuedl": True,
         "http_headers": {
             "User-Agent": (
                 "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -45,15 +89,175 @@ def download_short(url: str, download_dir: str) -> Tuple[Path, dict]:
     if cookies_path:
         base_opts["cookiefile"] = cookies_path
 
-    try:
-        return _download_with_options(
-            url,
-            download_path,
-            {**base_opts, "format": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/bestvideo+bestaudio/best"},
-        )
-    except Exception:
-        return _download_with_options(
-            url,
-            download_path,
-            {**base_opts, "format": "bestvideo*+bestaudio*/best"},
-        )
+    return base_opts
+
+
+class DownloadEngine:
+    """yt-dlp front end keeping one ``YoutubeDL`` per worker thread across jobs."""
+
+    def __init__(self) -> None:
+        started = time.monotonic()
+        self._youtube_dl = importlib.import_module("yt_dlp").YoutubeDL
+        elapsed = time.monotonic() - started
+        STAGE_SECONDS.observe(elapsed, stage="import", platform="yt-dlp")
+        logging.info("Loaded yt-dlp in %.2fs", elapsed)
+        self._local = threading.local()
+        self._metadata: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._metadata_lock = threading.Lock()
+
+    def _ydl(self) -> YoutubeDL:
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl = self._youtube_dl(_base_options())
+            ydl.add_progress_hook(self._report)
+            self._local.ydl = ydl
+        return ydl
+
+    def _report(self, status: dict) -> None:
+        report = getattr(self._local, "report", None)
+        if report is not None:
+            report(status)
+
+    def _flat_ydl(self) -> YoutubeDL:
+        ydl = getattr(self._local, "flat_ydl", None)
+        if ydl is None:
+            ydl = self._youtube_dl(
+                {
+                    **_base_options(),
+                    "noplaylist": False,
+                    "extract_flat": "in_playlist",
+                    "lazy_playlist": False,
+                }
+            )
+            self._local.flat_ydl = ydl
+        return ydl
+
+    def extract_info(self, url: str) -> dict:
+        return self._ydl().extract_info(url, download=False)
+
+    def metadata(self, url: str, video_id: str) -> dict:
+        """Return the info dict for ``video_id``, kept for METADATA_TTL_SECONDS."""
+        now = time.monotonic()
+        with self._metadata_lock:
+            cached = self._metadata.get(video_id)
+            if cached is not None and now - cached[0] < METADATA_TTL_SECONDS:
+                self._metadata.move_to_end(video_id)
+                return cached[1]
+
+        with STAGE_SECONDS.time(stage="extract", platform="youtube"):
+            try:
+                info = self.extract_info(url)
+            except Exception as exc:
+                # yt-dlp prefixes its messages for the terminal.
+                message = str(exc).removeprefix("ERROR: ")
+                raise VideoUnavailable(message) from exc
+        if info.get("live_status") in LIVE_STATUSES:
+            raise VideoUnavailable(f"The video {LIVE_STATUSES[info['live_status']]}.")
+        if not info.get("formats") and not info.get("url"):
+            raise VideoUnavailable("The video has no downloadable formats.")
+
+        with self._metadata_lock:
+            self._metadata[video_id] = (now, info)
+            self._metadata.move_to_end(video_id)
+            while len(self._metadata) > METADATA_CACHE_SIZE:
+                self._metadata.popitem(last=False)
+        return info
+
+    def expand(self, url: str, limit: int) -> list[str]:
+        """Return up to ``limit`` video ids from a flat extraction of a playlist or channel."""
+        ydl = self._flat_ydl()
+        ydl.params["playlistend"] = limit
+        info = ydl.extract_info(url, download=False)
+        video_ids = []
+        for entry in info.get("entries") or []:
+            if not entry or entry.get("_type") == "playlist":
+                continue
+            if entry.get("id"):
+                video_ids.append(entry["id"])
+        return video_ids[:limit]
+
+    def download(
+        self,
+        info: dict,
+        target_dir: Path,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    ) -> Tuple[Path, dict]:
+        """Download ``info`` into ``target_dir``; ``progress(done, total)`` gets the bytes."""
+        ydl = self._ydl()
+        ydl.params["paths"] = {"home": str(target_dir)}
+        parts: dict[str, tuple[int, Optional[int]]] = {}
+
+        def report(status: dict) -> None:
+            if status.get("status") not in ("downloading", "finished"):
+                return
+            total = status.get("total_bytes") or status.get("total_bytes_estimate")
+            parts[status.get("filename", "")] = (status.get("downloaded_bytes") or 0, total)
+            totals = [part_total for _, part_total in parts.values()]
+            progress(
+                sum(done for done, _ in parts.values()),
+                sum(totals) if all(totals) else None,
+            )
+
+        self._local.report = report if progress else None
+        try:
+            result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+        finally:
+            self._local.report = None
+
+        downloads = result.get("requested_downloads") or []
+        if downloads and downloads[0].get("filepath"):
+            file_path = Path(downloads[0]["filepath"])
+        else:
+            file_path = Path(ydl.prepare_filename(result))
+
+        if not file_path.exists() or file_path.stat().st_size == 0:
+            raise RuntimeError("Downloaded file is empty.")
+
+        return file_path, result
+
+
+_engine: Optional[DownloadEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> DownloadEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = DownloadEngine()
+        return _engine
+
+
+def fetch_metadata(url: str, video_id: str) -> dict:
+    return get_engine().metadata(url, video_id)
+
+
+def _download_into(
+    url: str,
+    video_id: str,
+    cache: DownloadCache,
+    download_path: Path,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+) -> Tuple[Path, dict]:
+    engine = get_engine()
+    info = engine.metadata(url, video_id)
+    # Waits here, before anything is written, when the disk is short.
+    with cache.reserve(expected_size(info)):
+        started = time.monotonic()
+        with STAGE_SECONDS.time(stage="download", platform="youtube"):
+            file_path, info = engine.download(info, download_path, progress)
+    record_transfer("download", "youtube", file_path.stat().st_size, time.monotonic() - started)
+    return file_path, {key: info.get(key) for key in CACHED_INFO_KEYS}
+
+
+def download_short(
+    url: str,
+    video_id: str,
+    cache: DownloadCache,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+) -> Tuple[Path, dict]:
+    """Return the pinned cached download of ``url``; release it with ``cache.release``."""
+    entry = cache.get_or_create(
+        cache_key(video_id), lambda tmp_dir: _download_into(url, video_id, cache, tmp_dir, progress)
+    )
+    return entry.path, entry.info
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 8 * 1024 * 1024
+IDLE_TIMEOUT_SECONDS = 30
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+    body: bytes = b""
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: dict[str, str] = field(default_factory=dict)
+    # (path, offset, count) streamed with loop.sendfile() instead of ``body``.
+    file: Optional[tuple[Path, int, int]] = None
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class HttpServer:
+    """Small HTTP/1.1 server for the bot's local endpoints; the longest path prefix wins."""
+
+    def __init__(self, host: str, port: int, max_body_bytes: int = MAX_BODY_BYTES) -> None:
+        self.host = host
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self._routes: list[tuple[str, str, Handler]] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    def route(self, method: str, prefix: str, handler: Handler) -> None:
+        self._routes.append((method.upper(), prefix, handler))
+        self._routes.sort(key=lambda item: len(item[1]), reverse=True)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        # Report the real port when started on port 0.
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info("HTTP server listening on %s:%s", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        # Closing the listener leaves accepted connections open; end them too.
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    def _find_handler(self, method: str, path: str) -> Optional[Handler]:
+        lookup = "GET" if method == "HEAD" else method
+        for route_method, prefix, handler in self._routes:
+            if route_method == lookup and path.startswith(prefix):
+                return handler
+        return None
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request, keep_alive = await self._read_request(reader)
+                if request is None:
+                    break
+                handler = self._find_handler(request.method, request.path)
+                if handler is None:
+                    response = Response(status=404, body=b"Not found")
+                else:
+                    try:
+                        response = await handler(request)
+                    except Exception:
+                        logging.exception("HTTP handler failed for %s", request.path)
+                        response = Response(status=500, body=b"Internal error")
+                await self._write_response(writer, request, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except asyncio.TimeoutError:
+            pass
+        except _BadRequest as exc:
+            writer.write(_status_line(400) + b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+            logging.debug("Bad HTTP request: %s", exc)
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> tuple[Optional[Request], bool]:
+        try:
+            head = await asyncio.wait_for(
+                reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT_SECONDS
+            )
+        except asyncio.IncompleteReadError as exc:
+            if not exc.partial:
+                return None, False
+            raise
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError as exc:
+            raise _BadRequest(lines[0]) from exc
+
+        headers: dict[str, str] = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError as exc:
+            raise _BadRequest("invalid Content-Length") from exc
+        if length < 0 or length > self.max_body_bytes:
+            raise _BadRequest(f"body too large: {length}")
+        body = await reader.readexactly(length) if length else b""
+
+        parts = urlsplit(target)
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" and (
+            version == "HTTP/1.1" or connection == "keep-alive"
+        )
+        request = Request(
+            method=method.upper(),
+            path=unquote(parts.path),
+            query=dict(parse_qsl(parts.query)),
+            headers=headers,
+            body=body,
+        )
+        return request, keep_alive
+
+    async def _write_response(
+        self,
+        writer: asyncio.StreamWriter,
+        request: Request,
+        response: Response,
+        keep_alive: bool,
+    ) -> None:
+        length = response.file[2] if response.file else len(response.body)
+        headers = {
+            "Content-Type": response.content_type,
+            "Content-Length": str(length),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **response.headers,
+        }
+        head = _status_line(response.status) + "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items()
+        ).encode("latin-1") + b"\r\n"
+        writer.write(head)
+
+        if request.method == "HEAD":
+            await writer.drain()
+            return
+
+        if response.file:
+            await writer.drain()
+            path, offset, count = response.file
+            loop = asyncio.get_running_loop()
+            with path.open("rb") as source:
+                await loop.sendfile(writer.transport, source, offset, count)
+        else:
+            writer.write(response.body)
+            await writer.drain()
+
+
+def _status_line(status: int) -> bytes:
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = ""
+    return f"HTTP/1.1 {status} {reason}\r\n".encode("latin-1")
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import importlib
+import logging
 import re
+import threading
 from pathlib import Path
 
 
@@ -21,46 +23,69 @@ def _normalize_session_id(raw_value: str) -> str:
     return value
 
 
-def upload_reel(
-    *,
-    file_path: Path,
-    caption: str,
-    username: str,
-    password: str,
-    session_id: str,
-    session_path: str,
-) -> str:
-    normalized_session_id = _normalize_session_id(session_id)
-    if not session_id and (not username or not password):
-        raise InstagramUploadError(
-            "Missing Instagram credentials: provide INSTAGRAM_SESSION_ID or username/password"
-        )
-
-    instagrapi_module = importlib.import_module("instagrapi")
-    client_class = getattr(instagrapi_module, "Client")
-    client = client_class()
-    session_file = Path(session_path)
-
-    if session_file.exists():
-        client.load_settings(str(session_file))
-
-    logged_in = False
-    if client.user_id:
-        try:
-            client.get_timeline_feed()
-            logged_in = True
-        except Exception:
-            logged_in = False
+def _is_login_error(exc: Exception) -> bool:
+    return type(exc).__name__ == "LoginRequired" or "login_required" in str(exc).lower()
+
+
+class InstagramSession:
+    """A logged-in instagrapi client reused between reels."""
+
+    def __init__(self, *, username: str, password: str, session_id: str, session_path: str) -> None:
+        self.username = username
+        self.password = password
+        self.session_id = session_id
+        self.session_file = Path(session_path)
+        self._lock = threading.Lock()
+        self._client = None
+        self._saved_settings: str | None = None
+
+    def upload(self, file_path: Path, caption: str) -> str:
+        with self._lock:
+            client = self._ensure_client(use_saved_settings=True)
+            try:
+                media = self._clip_upload(client, file_path, caption)
+            except InstagramUploadError as exc:
+                if not _is_login_error(exc.__cause__ or exc):
+                    raise
+                logging.info("Instagram session expired, logging in again")
+                self._client = None
+                client = self._ensure_client(use_saved_settings=False)
+                media = self._clip_upload(client, file_path, caption)
+
+            self._save_settings(client)
+            media_id = getattr(media, "id", None) or str(getattr(media, "pk", ""))
+            return str(media_id)
+
+    def _ensure_client(self, *, use_saved_settings: bool):
+        if self._client is not None:
+            return self._client
+
+        instagrapi_module = importlib.import_module("instagrapi")
+        client_class = getattr(instagrapi_module, "Client")
+        client = client_class()
+
+        if use_saved_settings and self.session_file.exists():
+            self._saved_settings = self.session_file.read_text()
+            client.load_settings(str(self.session_file))
+
+        if not client.user_id:
+            self._login(client)
+
+        self._client = client
+        return client
+
+    def _login(self, client) -> None:
+        normalized_session_id = _normalize_session_id(self.session_id)
+        username, password = self.username, self.password
+
+        session_login_error: Exception | None = None
+        if normalized_session_id:
+            try:
+                client.login_by_sessionid(normalized_session_id)
+                return
+            except Exception as exc:
+                session_login_error = exc
 
-    session_login_error: Exception | None = None
-    if not logged_in and normalized_session_id:
-        try:
-            client.login_by_sessionid(normalized_session_id)
-            logged_in = True
-        except Exception as exc:
-            session_login_error = exc
-
-    if not logged_in:
         if not username or not password:
             if session_login_error:
                 raise InstagramUploadError(
@@ -84,17 +109,65 @@ def upload_reel(
                 ) from exc
             raise InstagramUploadError(f"Instagram login failed: {exc}") from exc
 
-    try:
-        media = client.clip_upload(path=str(file_path), caption=caption)
-    except Exception as exc:
-        error_text = str(exc)
-        if "challenge_required" in error_text.lower():
-            raise InstagramUploadError(
-                "Instagram challenge required. Complete verification once in the Instagram mobile app/web for this account, then refresh INSTAGRAM_SESSION_ID and retry from the same trusted IP/device."
-            ) from exc
-        raise InstagramUploadError(f"Instagram reel upload failed: {exc}") from exc
-
-    session_file.parent.mkdir(parents=True, exist_ok=True)
-    session_file.write_text(client.dumps_settings())
-    media_id = getattr(media, "id", None) or str(getattr(media, "pk", ""))
-    return str(media_id)
+    def _clip_upload(self, client, file_path: Path, caption: str):
+        try:
+            return client.clip_upload(path=str(file_path), caption=caption)
+        except Exception as exc:
+            error_text = str(exc)
+            if "challenge_required" in error_text.lower():
+                raise InstagramUploadError(
+                    "Instagram challenge required. Complete verification once in the Instagram mobile app/web for this account, then refresh INSTAGRAM_SESSION_ID and retry from the same trusted IP/device."
+                ) from exc
+            raise InstagramUploadError(f"Instagram reel upload failed: {exc}") from exc
+
+    def _save_settings(self, client) -> None:
+        settings = client.dumps_settings()
+        if settings == self._saved_settings:
+            return
+        self.session_file.parent.mkdir(parents=True, exist_ok=True)
+        self.session_file.write_text(settings)
+        self._saved_settings = settings
+
+
+_sessions: dict[tuple[str, str, str], InstagramSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(
+    *, username: str, password: str, session_id: str, session_path: str
+) -> InstagramSession:
+    key = (username, _normalize_session_id(session_id), session_path)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = InstagramSession(
+                username=username,
+                password=password,
+                session_id=session_id,
+                session_path=session_path,
+            )
+            _sessions[key] = session
+        return session
+
+
+def upload_reel(
+    *,
+    file_path: Path,
+    caption: str,
+    username: str,
+    password: str,
+    session_id: str,
+    session_path: str,
+) -> str:
+    if not session_id and (not username or not password):
+        raise InstagramUploadError(
+            "Missing Instagram credentials: provide INSTAGRAM_SESSION_ID or username/password"
+        )
+
+    session = get_session(
+        username=username,
+        password=password,
+        session_id=session_id,
+        session_path=session_path,
+    )
+    return session.upload(file_path, caption)
@@ -1,44 +1,76 @@
 from __future__ import annotations
 
-import time
-from typing import Any
+import threading
+from typing import Any, Optional
 
 import requests
 
 GRAPH_BASE_URL = "https://graph.facebook.com/v22.0"
+# Graph error codes for throttling and temporary outages.
+TRANSIENT_ERROR_CODES = {1, 2, 4, 17, 32, 613}
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
 
 
 class InstagramGraphUploadError(RuntimeError):
-    pass
+    """A failed Graph request; ``transient`` overrides the guess from ``status``."""
+
+    def __init__(
+        self, message: str, status: Optional[int] = None, transient: Optional[bool] = None
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.transient = transient
+
+
+def _is_transient_error(error: Any) -> Optional[bool]:
+    if not isinstance(error, dict):
+        return None
+    if error.get("is_transient") or error.get("code") in TRANSIENT_ERROR_CODES:
+        return True
+    return None
+
+
+def _session() -> requests.Session:
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = requests.Session()
+        return _shared_session
 
 
 def _ensure_ok(response: requests.Response, context: str) -> dict[str, Any]:
     try:
         payload = response.json()
     except Exception as exc:
-        raise InstagramGraphUploadError(f"{context}: invalid JSON response") from exc
+        raise InstagramGraphUploadError(
+            f"{context}: invalid JSON response", status=response.status_code
+        ) from exc
 
     if response.status_code >= 400:
         error = payload.get("error") or {}
         message = error.get("message") or payload
-        raise InstagramGraphUploadError(f"{context}: {message}")
+        raise InstagramGraphUploadError(
+            f"{context}: {message}",
+            status=response.status_code,
+            transient=_is_transient_error(error),
+        )
 
     if payload.get("error"):
-        raise InstagramGraphUploadError(f"{context}: {payload['error']}")
+        raise InstagramGraphUploadError(
+            f"{context}: {payload['error']}", transient=_is_transient_error(payload["error"])
+        )
 
     return payload
 
 
-def upload_reel_from_url(
-    *,
-    ig_user_id: str,
-    access_token: str,
-    video_url: str,
-    caption: str,
-    timeout_seconds: int = 180,
+def create_reel_container(
+    *, ig_user_id: str, access_token: str, video_url: str, caption: str
 ) -> str:
+    """Ask Graph to fetch ``video_url`` into a reel container; return its id."""
     create_url = f"{GRAPH_BASE_URL}/{ig_user_id}/media"
-    create_response = requests.post(
+    create_response = _session().post(
         create_url,
         data={
             "media_type": "REELS",
@@ -52,32 +84,32 @@ def upload_reel_from_url(
     creation_id = create_payload.get("id")
     if not creation_id:
         raise InstagramGraphUploadError("Instagram Graph media create did not return id")
+    return str(creation_id)
 
-    status_url = f"{GRAPH_BASE_URL}/{creation_id}"
-    deadline = time.time() + timeout_seconds
-    while time.time() < deadline:
-        status_response = requests.get(
-            status_url,
-            params={
-                "fields": "status_code",
-                "access_token": access_token,
-            },
-            timeout=30,
-        )
-        status_payload = _ensure_ok(status_response, "Instagram Graph status check failed")
-        status_code = (status_payload.get("status_code") or "").upper()
 
-        if status_code == "FINISHED":
-            break
-        if status_code == "ERROR":
-            raise InstagramGraphUploadError("Instagram Graph media processing failed")
+def check_container_status(access_token: str, creation_id: str) -> Optional[str]:
+    """Return ``creation_id`` once FINISHED, ``None`` while still processing."""
+    status_response = _session().get(
+        f"{GRAPH_BASE_URL}/{creation_id}",
+        params={
+            "fields": "status_code",
+            "access_token": access_token,
+        },
+        timeout=30,
+    )
+    status_payload = _ensure_ok(status_response, "Instagram Graph status check failed")
+    status_code = (status_payload.get("status_code") or "").upper()
+
+    if status_code == "FINISHED":
+        return creation_id
+    if status_code == "ERROR":
+        raise InstagramGraphUploadError("Instagram Graph media processing failed")
+    return None
 
-        time.sleep(3)
-    else:
-        raise InstagramGraphUploadError("Instagram Graph media processing timed out")
 
+def publish_container(*, ig_user_id: str, access_token: str, creation_id: str) -> str:
     publish_url = f"{GRAPH_BASE_URL}/{ig_user_id}/media_publish"
-    publish_response = requests.post(
+    publish_response = _session().post(
         publish_url,
         data={
             "creation_id": creation_id,
@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+# Job lifecycle: queued -> downloaded -> done | failed.
+JOB_QUEUED = "queued"
+JOB_DOWNLOADED = "downloaded"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+UNFINISHED_JOB_STATES = (JOB_QUEUED, JOB_DOWNLOADED)
+
+# Per-platform lifecycle inside a job: pending -> uploading -> uploaded | failed.
+PLATFORM_PENDING = "pending"
+PLATFORM_UPLOADING = "uploading"
+PLATFORM_UPLOADED = "uploaded"
+PLATFORM_FAILED = "failed"
+
+# Only the info keys the pipeline reads are persisted.
+_INFO_KEYS = ("id", "title", "description", "duration", "ext", "width", "height")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    file_path TEXT,
+    info_json TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE TABLE IF NOT EXISTS job_platforms (
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    platform TEXT NOT NULL,
+    state TEXT NOT NULL,
+    result_id TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, platform)
+);
+CREATE TABLE IF NOT EXISTS processed_videos (
+    video_id TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    content_hash TEXT,
+    result_id TEXT NOT NULL,
+    job_id INTEGER,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (video_id, platform)
+);
+CREATE INDEX IF NOT EXISTS processed_videos_hash ON processed_videos (content_hash);
+CREATE TABLE IF NOT EXISTS upload_quota (
+    job_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    scheduled_at REAL NOT NULL,
+    day REAL NOT NULL,
+    units INTEGER NOT NULL,
+    started_at REAL,
+    PRIMARY KEY (job_id, platform)
+);
+CREATE INDEX IF NOT EXISTS upload_quota_day ON upload_quota (platform, day);
+"""
+
+# Columns added after the first release, added to existing databases on open.
+_JOB_COLUMNS = {
+    # Worker lease: who runs the job and until when, see claim_job().
+    "lease_owner": "TEXT",
+    "lease_expires": "REAL",
+    # Earliest time a worker may claim the job again, for deferred uploads.
+    "not_before": "REAL",
+    # The Telegram message a worker edits with the job's progress.
+    "status_message_id": "INTEGER",
+    # Set for batch jobs, whose outcome the front end reports.
+    "quiet": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+@dataclass
+class PlatformRecord:
+    state: str
+    result_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class QuotaBooking:
+    job_id: int
+    platform: str
+    scheduled_at: float
+    day: float
+    units: int
+    started_at: Optional[float] = None
+
+
+@dataclass
+class JobRecord:
+    id: int
+    url: str
+    video_id: str
+    state: str
+    file_path: Optional[Path]
+    info: Optional[dict]
+    error: Optional[str]
+    platforms: dict[str, PlatformRecord] = field(default_factory=dict)
+    status_message_id: Optional[int] = None
+    quiet: bool = False
+
+
+class JobStore:
+    """SQLite record of jobs and their per-platform progress, shared across threads."""
+
+    def __init__(self, path: str) -> None:
+        db_path = Path(path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in _JOB_COLUMNS.items():
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def create_job(
+        self,
+        url: str,
+        video_id: str,
+        *,
+        held_by: Optional[str] = None,
+        hold_seconds: float = 0,
+        quiet: bool = False,
+    ) -> int:
+        """Record a new job, leased to ``held_by`` for ``hold_seconds`` if given."""
+        now = time.time()
+        lease_expires = now + hold_seconds if held_by else None
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (url, video_id, state, created_at, updated_at, "
+                "lease_owner, lease_expires, quiet) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, video_id, JOB_QUEUED, now, now, held_by, lease_expires, int(quiet)),
+            )
+            return int(cursor.lastrowid)
+
+    def set_status_message(self, job_id: int, message_id: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status_message_id = ? WHERE id = ?", (message_id, job_id)
+            )
+
+    def claim_job(self, owner: str, lease_seconds: float) -> Optional[int]:
+        """Lease the oldest unfinished job without a live lease to ``owner``."""
+        now = time.time()
+        placeholders = ", ".join("?" for _ in UNFINISHED_JOB_STATES)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "UPDATE jobs SET lease_owner = ?, lease_expires = ? WHERE id = ("
+                f"SELECT id FROM jobs WHERE state IN ({placeholders}) "
+                "AND (lease_expires IS NULL OR lease_expires < ?) "
+                "AND (not_before IS NULL OR not_before <= ?) "
+                "ORDER BY id LIMIT 1) RETURNING id",
+                (owner, now + lease_seconds, *UNFINISHED_JOB_STATES, now, now),
+            ).fetchone()
+        return None if row is None else int(row["id"])
+
+    def renew_lease(self, job_id: int, owner: str, lease_seconds: float) -> bool:
+        """Extend ``owner``'s lease; False if the job is no longer leased to it."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+                (time.time() + lease_seconds, job_id, owner),
+            )
+        return cursor.rowcount == 1
+
+    def release_lease(
+        self, job_id: int, owner: str, not_before: Optional[float] = None
+    ) -> None:
+        """Give up ``owner``'s lease; the job is claimable again from ``not_before``."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET lease_owner = NULL, lease_expires = NULL, not_before = ? "
+                "WHERE id = ? AND lease_owner = ?",
+                (not_before, job_id, owner),
+            )
+
+    def mark_downloaded(self, job_id: int, file_path: Path, info: dict) -> None:
+        info_json = json.dumps({key: info.get(key) for key in _INFO_KEYS})
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, file_path = ?, info_json = ?, updated_at = ? "
+                "WHERE id = ?",
+                (JOB_DOWNLOADED, str(file_path), info_json, time.time(), job_id),
+            )
+
+    def finish(self, job_id: int, state: str, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE id = ?",
+                (state, error, time.time(), job_id),
+            )
+
+    def set_platform_state(
+        self,
+        job_id: int,
+        platform: str,
+        state: str,
+        *,
+        result_id: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO job_platforms (job_id, platform, state, result_id, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (job_id, platform) DO UPDATE SET "
+                "state = excluded.state, result_id = excluded.result_id, "
+                "error = excluded.error, updated_at = excluded.updated_at",
+                (job_id, platform, state, result_id, error, time.time()),
+            )
+
+    def get_job(self, job_id: int) -> Optional[JobRecord]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            return self._record(row)
+
+    def unfinished_jobs(self) -> list[JobRecord]:
+        placeholders = ", ".join("?" for _ in UNFINISHED_JOB_STATES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE state IN ({placeholders}) ORDER BY id",
+                UNFINISHED_JOB_STATES,
+            ).fetchall()
+            return [self._record(row) for row in rows]
+
+    def record_processed(
+        self,
+        video_id: str,
+        platform: str,
+        result_id: str,
+        *,
+        content_hash: Optional[str] = None,
+        job_id: Optional[int] = None,
+    ) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed_videos "
+                "(video_id, platform, content_hash, result_id, job_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, platform, content_hash, result_id, job_id, time.time()),
+            )
+
+    def find_processed(
+        self, *, video_id: Optional[str] = None, content_hash: Optional[str] = None
+    ) -> dict[str, str]:
+        """Return ``{platform: result_id}`` uploaded before for this video id or content hash."""
+        clauses = []
+        params: list[str] = []
+        if video_id:
+            clauses.append("video_id = ?")
+            params.append(video_id)
+        if content_hash:
+            clauses.append("content_hash = ?")
+            params.append(content_hash)
+        if not clauses:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT platform, result_id FROM processed_videos WHERE "
+                + " OR ".join(clauses)
+                + " ORDER BY created_at",
+                params,
+            ).fetchall()
+        return {row["platform"]: row["result_id"] for row in rows}
+
+    def add_quota_booking(self, booking: QuotaBooking) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO upload_quota "
+                "(job_id, platform, scheduled_at, day, units, started_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    booking.job_id,
+                    booking.platform,
+                    booking.scheduled_at,
+                    booking.day,
+                    booking.units,
+                    booking.started_at,
+                ),
+            )
+
+    def quota_bookings(self, job_id: Optional[int] = None) -> list[QuotaBooking]:
+        """Return the bookings of ``job_id``, or of every job, by slot time."""
+        query = "SELECT * FROM upload_quota"
+        params: tuple = ()
+        if job_id is not None:
+            query += " WHERE job_id = ?"
+            params = (job_id,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY scheduled_at", params).fetchall()
+        return [
+            QuotaBooking(
+                job_id=row["job_id"],
+                platform=row["platform"],
+                scheduled_at=row["scheduled_at"],
+                day=row["day"],
+                units=row["units"],
+                started_at=row["started_at"],
+            )
+            for row in rows
+        ]
+
+    def quota_used(self, platform: str, day: float) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(units), 0) FROM upload_quota WHERE platform = ? AND day = ?",
+                (platform, day),
+            ).fetchone()
+        return int(row[0])
+
+    def last_quota_slot(self, platform: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(scheduled_at) FROM upload_quota WHERE platform = ?", (platform,)
+            ).fetchone()
+        return row[0]
+
+    def start_quota_booking(self, job_id: int, platform: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE upload_quota SET started_at = ? "
+                "WHERE job_id = ? AND platform = ? AND started_at IS NULL",
+                (time.time(), job_id, platform),
+            )
+
+    def delete_quota_booking(self, job_id: int, platform: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM upload_quota WHERE job_id = ? AND platform = ?",
+                (job_id, platform),
+            )
+
+    def prune_quota_bookings(self, before: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM upload_quota WHERE scheduled_at < ?", (before,))
+
+    def _record(self, row: sqlite3.Row) -> JobRecord:
+        platforms = {
+            platform_row["platform"]: PlatformRecord(
+                state=platform_row["state"],
+                result_id=platform_row["result_id"],
+                error=platform_row["error"],
+            )
+            for platform_row in self._conn.execute(
+                "SELECT * FROM job_platforms WHERE job_id = ?", (row["id"],)
+            )
+        }
+        return JobRecord(
+            id=row["id"],
+            url=row["url"],
+            video_id=row["video_id"],
+            state=row["state"],
+            file_path=Path(row["file_path"]) if row["file_path"] else None,
+            info=json.loads(row["info_json"]) if row["info_json"] else None,
+            error=row["error"],
+            platforms=platforms,
+            status_message_id=row["status_message_id"],
+            quiet=bool(row["quiet"]),
+        )
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+
+# Threads per concurrent job: the download plus the blocking uploader calls.
+THREADS_PER_JOB = 4
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class JobExecutor:
+    """Runs jobs with bounded concurrency and a bounded wait queue."""
+
+    def __init__(self, concurrency: int, queue_size: int) -> None:
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.concurrency * THREADS_PER_JOB,
+            thread_name_prefix="job",
+        )
+        self._queue: asyncio.Queue[Callable[[], Awaitable[None]]] | None = None
+        self._workers: list[asyncio.Task] = []
+        self._running = 0
+        self._slot_freed: asyncio.Event | None = None
+        self._timers: set[asyncio.TimerHandle] = set()
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    async def start(self) -> None:
+        if self._queue is not None:
+            return
+        # asyncio treats maxsize 0 as unbounded, so admission is capped in submit().
+        self._queue = asyncio.Queue()
+        self._slot_freed = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+
+    def submit(self, job: Callable[[], Awaitable[None]], *, force: bool = False) -> None:
+        """Queue ``job``; ``force`` skips the admission limit."""
+        if self._queue is None:
+            raise RuntimeError("JobExecutor is not started")
+        idle_workers = self.concurrency - self._running
+        if not force and self._queue.qsize() >= self.queue_size + max(0, idle_workers):
+            raise JobQueueFull(
+                f"Job queue is full ({self._running} running, {self._queue.qsize()} queued)"
+            )
+        self._queue.put_nowait(job)
+
+    async def submit_when_ready(self, job: Callable[[], Awaitable[None]]) -> None:
+        """Queue ``job``, waiting for room instead of raising JobQueueFull."""
+        while True:
+            try:
+                self.submit(job)
+                return
+            except JobQueueFull:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+
+    def submit_at(self, job: Callable[[], Awaitable[None]], when: float) -> None:
+        """Queue ``job`` at wall-clock time ``when``, skipping the admission limit."""
+        loop = asyncio.get_running_loop()
+
+        def fire() -> None:
+            self._timers.discard(handle)
+            self.submit(job, force=True)
+
+        handle = loop.call_later(max(0.0, when - time.time()), fire)
+        self._timers.add(handle)
+
+    async def run_blocking(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        return await self.spawn_blocking(fn, *args, **kwargs)
+
+    def spawn_blocking(
+        self, fn: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> asyncio.Future:
+        """Start ``fn`` on the pool and return its future without awaiting it."""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    async def stop(self) -> None:
+        for handle in self._timers:
+            handle.cancel()
+        self._timers.clear()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            self._running += 1
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logging.exception("Job failed")
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+                self._slot_freed.set()
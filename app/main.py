@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 
 from .config import Config
 from .telegram_bot import build_app
+from .webhook import run_webhook
 
 
 def main() -> None:
@@ -16,6 +17,9 @@ def main() -> None:
 
     config = Config.from_env()
     app = build_app(config)
+    if config.telegram_mode == "webhook":
+        asyncio.run(run_webhook(app, config))
+        return
     asyncio.set_event_loop(asyncio.new_event_loop())
     app.run_polling(close_loop=False)
 
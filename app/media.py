@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import shutil
+import struct
+import subprocess
+from dataclasses import dataclass, field
+from fractions import Fraction
+from pathlib import Path
+from typing import Optional
+
+from .cache import CacheEntry, DownloadCache
+from .metrics import STAGE_SECONDS
+
+PROBE_TIMEOUT_SECONDS = 60
+CONVERT_TIMEOUT_SECONDS = 30 * 60
+
+# Prepared variants, from cheapest to most expensive.
+VARIANT_REMUX = "remux"  # mp4 container with the moov atom up front, streams copied
+VARIANT_AUDIO = "aac"  # remux plus AAC audio, video copied
+VARIANT_TRANSCODE = "h264"  # H.264/AAC, 4:2:0, long side capped
+
+TRANSCODE_MAX_LONG_SIDE = 1920
+TRANSCODE_MAX_FPS = 60
+
+
+class MediaPrepError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    container: str
+    faststart: bool
+    video_codec: Optional[str]
+    width: int
+    height: int
+    fps: float
+    pix_fmt: Optional[str]
+    audio_codec: Optional[str]
+    duration: float
+
+
+@dataclass(frozen=True)
+class PlatformProfile:
+    """What a platform accepts without server-side conversion."""
+
+    name: str
+    video_codecs: frozenset = field(default_factory=lambda: frozenset({"h264"}))
+    audio_codecs: frozenset = field(default_factory=lambda: frozenset({"aac"}))
+    pix_fmts: frozenset = field(default_factory=lambda: frozenset({"yuv420p"}))
+    max_long_side: int = TRANSCODE_MAX_LONG_SIDE
+    max_fps: float = TRANSCODE_MAX_FPS
+    requires_mp4: bool = True
+    requires_faststart: bool = False
+
+
+# YouTube transcodes whatever it receives, so its upload is the original file.
+PLATFORM_PROFILES: dict[str, Optional[PlatformProfile]] = {
+    "youtube": None,
+    "tiktok": PlatformProfile(
+        "tiktok",
+        video_codecs=frozenset({"h264", "hevc"}),
+        max_long_side=4096,
+    ),
+    "instagram": PlatformProfile(
+        "instagram-reels",
+        video_codecs=frozenset({"h264", "hevc"}),
+        requires_faststart=True,
+    ),
+}
+
+
+@functools.lru_cache(maxsize=1)
+def tools_available() -> bool:
+    if shutil.which("ffprobe") and shutil.which("ffmpeg"):
+        return True
+    logging.warning("ffmpeg/ffprobe not found; videos are uploaded without preparation")
+    return False
+
+
+def _moov_before_mdat(file_path: Path) -> bool:
+    """Walk the top-level MP4 boxes and report whether moov precedes mdat."""
+    with file_path.open("rb") as source:
+        while True:
+            header = source.read(8)
+            if len(header) < 8:
+                return False
+            size, box_type = struct.unpack(">I4s", header)
+            if box_type == b"moov":
+                return True
+            if box_type == b"mdat":
+                return False
+            if size == 1:
+                largesize = source.read(8)
+                if len(largesize) < 8:
+                    return False
+                size = struct.unpack(">Q", largesize)[0]
+                if size < 16:
+                    return False
+                source.seek(size - 16, 1)
+            elif size < 8:
+                # 0 runs to the end of the file; 2-7 are invalid.
+                return False
+            else:
+                source.seek(size - 8, 1)
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    try:
+        return float(Fraction(rate)) if rate else 0.0
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe(file_path: Path) -> MediaInfo:
+    with STAGE_SECONDS.time(stage="probe", platform=""):
+        result = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-print_format",
+                "json",
+                "-show_format",
+                "-show_streams",
+                str(file_path),
+            ],
+            capture_output=True,
+            text=True,
+            timeout=PROBE_TIMEOUT_SECONDS,
+        )
+    if result.returncode != 0:
+        raise MediaPrepError(f"ffprobe failed: {result.stderr.strip()}")
+    data = json.loads(result.stdout)
+
+    streams = data.get("streams") or []
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    format_names = (data.get("format") or {}).get("format_name", "").split(",")
+    is_mp4 = "mp4" in format_names or "mov" in format_names
+    return MediaInfo(
+        container="mp4" if is_mp4 else format_names[0],
+        faststart=is_mp4 and _moov_before_mdat(file_path),
+        video_codec=video.get("codec_name"),
+        width=int(video.get("width") or 0),
+        height=int(video.get("height") or 0),
+        fps=_parse_rate(video.get("avg_frame_rate")),
+        pix_fmt=video.get("pix_fmt"),
+        audio_codec=audio.get("codec_name"),
+        duration=float((data.get("format") or {}).get("duration") or 0),
+    )
+
+
+def choose_variant(media: MediaInfo, profile: PlatformProfile) -> Optional[str]:
+    """Return the cheapest variant ``profile`` accepts, or None for the source."""
+    if (
+        media.video_codec not in profile.video_codecs
+        or media.pix_fmt not in profile.pix_fmts
+        or max(media.width, media.height) > profile.max_long_side
+        or media.fps > profile.max_fps
+    ):
+        return VARIANT_TRANSCODE
+    if media.audio_codec is not None and media.audio_codec not in profile.audio_codecs:
+        return VARIANT_AUDIO
+    if (profile.requires_mp4 and media.container != "mp4") or (
+        profile.requires_faststart and not media.faststart
+    ):
+        return VARIANT_REMUX
+    return None
+
+
+def _ffmpeg_args(media: MediaInfo, variant: str, source: Path, target: Path) -> list[str]:
+    args = ["ffmpeg", "-y", "-v", "error", "-i", str(source), "-map", "0:v:0", "-map", "0:a:0?"]
+    audio_copy = media.audio_codec == "aac"
+    if variant == VARIANT_TRANSCODE:
+        filters = [
+            f"scale='min({TRANSCODE_MAX_LONG_SIDE},iw)':'min({TRANSCODE_MAX_LONG_SIDE},ih)'"
+            ":force_original_aspect_ratio=decrease:force_divisible_by=2"
+        ]
+        if media.fps > TRANSCODE_MAX_FPS:
+            filters.append(f"fps={TRANSCODE_MAX_FPS}")
+        args += [
+            "-vf",
+            ",".join(filters),
+            "-c:v",
+            "libx264",
+            "-preset",
+            "veryfast",
+            "-crf",
+            "20",
+            "-pix_fmt",
+            "yuv420p",
+        ]
+    else:
+        args += ["-c:v", "copy"]
+    if audio_copy or variant == VARIANT_REMUX:
+        args += ["-c:a", "copy"]
+    else:
+        args += ["-c:a", "aac", "-b:a", "160k"]
+    return args + ["-movflags", "+faststart", str(target)]
+
+
+def _convert(media: MediaInfo, variant: str, source: Path, tmp_dir: Path) -> tuple[Path, dict]:
+    target = tmp_dir / f"{variant}.mp4"
+    stage = "transcode" if variant == VARIANT_TRANSCODE else "remux"
+    with STAGE_SECONDS.time(stage=stage, platform=""):
+        result = subprocess.run(
+            _ffmpeg_args(media, variant, source, target),
+            capture_output=True,
+            text=True,
+            timeout=CONVERT_TIMEOUT_SECONDS,
+        )
+    if result.returncode != 0 or not target.exists() or target.stat().st_size == 0:
+        raise MediaPrepError(f"ffmpeg {variant} failed: {result.stderr.strip()[-500:]}")
+    return target, {"variant": variant, "source": source.name}
+
+
+def prepare(
+    cache: DownloadCache, source_key: str, source: Path, media: MediaInfo, variant: str
+) -> CacheEntry:
+    """Return the pinned cached ``variant`` of ``source``, converting on a miss."""
+
+    def produce(tmp_dir: Path) -> tuple[Path, dict]:
+        # A conversion comes out about the size of its source.
+        with cache.reserve(source.stat().st_size, holding=[source]):
+            return _convert(media, variant, source, tmp_dir)
+
+    logging.info("Preparing %s variant of %s", variant, source.name)
+    return cache.get_or_create(f"{source_key}-{variant}", produce)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import re
+import time
+from pathlib import Path
+from typing import Optional
+
+from .http_server import HttpServer, Request, Response
+
+MEDIA_PREFIX = "/media/"
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class MediaServer:
+    """Serves downloads to the Instagram Graph API over signed, expiring URLs."""
+
+    def __init__(
+        self, server: Optional[HttpServer], root: Path, public_url: str, secret: bytes
+    ) -> None:
+        self.root = root.resolve()
+        self.public_url = public_url.rstrip("/")
+        self._secret = secret
+        if server is not None:
+            server.route("GET", MEDIA_PREFIX, self.handle)
+
+    def url_for(self, file_path: Path, ttl_seconds: int) -> str:
+        expires = int(time.time()) + ttl_seconds
+        name = file_path.name
+        return f"{self.public_url}{MEDIA_PREFIX}{expires}/{self._sign(expires, name)}/{name}"
+
+    def _sign(self, expires: int, name: str) -> str:
+        message = f"{expires}/{name}".encode()
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def _resolve(self, request: Request) -> Optional[Path]:
+        parts = request.path[len(MEDIA_PREFIX) :].split("/")
+        if len(parts) != 3:
+            return None
+        expires_raw, signature, name = parts
+        if not expires_raw.isdigit() or int(expires_raw) < time.time():
+            return None
+        if not hmac.compare_digest(signature, self._sign(int(expires_raw), name)):
+            return None
+        file_path = (self.root / name).resolve()
+        if file_path.parent != self.root or not file_path.is_file():
+            return None
+        return file_path
+
+    async def handle(self, request: Request) -> Response:
+        file_path = self._resolve(request)
+        if file_path is None:
+            return Response(status=404, body=b"Not found")
+
+        size = file_path.stat().st_size
+        headers = {"Accept-Ranges": "bytes"}
+        content_type = "video/mp4" if file_path.suffix == ".mp4" else "application/octet-stream"
+
+        range_header = request.headers.get("range")
+        if not range_header or not _RANGE_RE.match(range_header.strip()):
+            # No range, or a multi-range request: send the whole file.
+            return Response(
+                content_type=content_type,
+                headers=headers,
+                file=(file_path, 0, size),
+            )
+
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(
+                status=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"},
+            )
+        start, end = byte_range
+        return Response(
+            status=206,
+            content_type=content_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+            file=(file_path, start, end - start + 1),
+        )
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Return the inclusive byte range, or None if it cannot be satisfied."""
+    first, last = _RANGE_RE.match(header.strip()).groups()
+    if size == 0:
+        return None
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from .http_server import HttpServer, Request, Response
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stage latencies run from sub-second status checks to half-hour uploads.
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+# 64 KiB/s up to 1 GiB/s.
+RATE_BUCKETS = tuple(float(64 * 1024 * 4**power) for power in range(8))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def summary(self) -> dict[tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """A gauge whose value is either set directly or read from a callback."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._functions: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            values[key] = float(function())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: (per-bucket counts, sum, count).
+        self._series: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._series[key] = (counts, total + value, count + 1)
+
+    def summary(self) -> dict[tuple[str, ...], tuple[int, float]]:
+        with self._lock:
+            return {key: (count, total) for key, (_, total, count) in self._series.items()}
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block, whether or not it raises."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            series = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._series.items()
+            )
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode()
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "repost_stage_duration_seconds",
+        "Time spent per pipeline stage.",
+        ("stage", "platform"),
+    )
+)
+TRANSFER_BYTES = REGISTRY.register(
+    Counter(
+        "repost_transfer_bytes_total",
+        "Bytes downloaded from YouTube or uploaded to a platform.",
+        ("direction", "platform"),
+    )
+)
+TRANSFER_RATE = REGISTRY.register(
+    Histogram(
+        "repost_transfer_bytes_per_second",
+        "Throughput of each completed download or upload.",
+        ("direction", "platform"),
+        buckets=RATE_BUCKETS,
+    )
+)
+ERRORS = REGISTRY.register(
+    Counter(
+        "repost_errors_total",
+        "Failures per stage and platform, including retried ones.",
+        ("stage", "platform"),
+    )
+)
+JOBS_FINISHED = REGISTRY.register(
+    Counter("repost_jobs_finished_total", "Jobs that reached a final state.", ("state",))
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter("repost_download_cache_requests_total", "Download cache lookups.", ("result",))
+)
+QUEUE_DEPTH = REGISTRY.register(
+    Gauge("repost_jobs_queued", "Jobs waiting for a free worker.")
+)
+JOBS_RUNNING = REGISTRY.register(
+    Gauge("repost_jobs_running", "Jobs currently being processed.")
+)
+DISK_RESERVED = REGISTRY.register(
+    Gauge(
+        "repost_download_disk_reserved_bytes",
+        "Disk space held for downloads and conversions in progress.",
+    )
+)
+POLLS_PENDING = REGISTRY.register(
+    Gauge(
+        "repost_status_polls_pending",
+        "Posts waiting for platform-side processing.",
+        ("platform",),
+    )
+)
+CIRCUITS_OPEN = REGISTRY.register(
+    Gauge(
+        "repost_circuit_open",
+        "Routes whose circuit breaker for the platform is open.",
+        ("platform",),
+    )
+)
+
+STARTUP_SECONDS = REGISTRY.register(
+    Gauge(
+        "repost_startup_seconds",
+        "Time from process start until the bot was ready for updates.",
+    )
+)
+RESIDENT_MEMORY = REGISTRY.register(
+    Gauge("repost_resident_memory_bytes", "Resident set size of the bot process.")
+)
+
+
+def process_rss_bytes() -> int:
+    """Current resident set size, or 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def process_uptime_seconds() -> float:
+    """Seconds since this process started, or 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/stat") as stat:
+            # Field 22, after the parenthesised command name, in clock ticks since boot.
+            started = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            now = float(uptime.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return max(0.0, now - started / os.sysconf("SC_CLK_TCK"))
+
+
+RESIDENT_MEMORY.set_function(process_rss_bytes)
+
+
+def record_transfer(direction: str, platform: str, size: int, seconds: float) -> None:
+    TRANSFER_BYTES.inc(size, direction=direction, platform=platform)
+    if seconds > 0:
+        TRANSFER_RATE.observe(size / seconds, direction=direction, platform=platform)
+
+
+class MetricsEndpoint:
+    def __init__(self, server: HttpServer, registry: Optional[Registry] = None) -> None:
+        self.registry = registry or REGISTRY
+        server.route("GET", "/metrics", self.handle)
+
+    async def handle(self, request: Request) -> Response:
+        return Response(body=self.registry.render(), content_type=CONTENT_TYPE)
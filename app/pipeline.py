@@ -0,0 +1,781 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import ModuleType
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .cache import DownloadCache
+from .config import Config
+from .downloader import cache_key, download_short, fetch_metadata
+from .job_store import (
+    JOB_DONE,
+    JOB_DOWNLOADED,
+    JOB_FAILED,
+    PLATFORM_FAILED,
+    PLATFORM_PENDING,
+    PLATFORM_UPLOADED,
+    PLATFORM_UPLOADING,
+    JobStore,
+    QuotaBooking,
+)
+from .jobs import JobExecutor
+from .media import PLATFORM_PROFILES, choose_variant, prepare, probe, tools_available
+from .metrics import ERRORS, JOBS_FINISHED, STAGE_SECONDS
+from .media_server import MediaServer
+from .platforms import backend, check_content, check_platforms
+from .poller import StatusPoller
+from .progress import JobProgress
+from .resilience import CircuitOpen, Resilience
+from .routes import DEFAULT_ROUTE
+from .scheduler import UploadDeferred, UploadScheduler, limits_from_config
+
+T = TypeVar("T")
+
+PLATFORM_NAMES = {
+    "youtube": "YouTube",
+    "tiktok": "TikTok",
+    "instagram": "Instagram",
+}
+
+# Platforms whose interrupted upload resumes its session instead of posting again.
+RESUMABLE_PLATFORMS = frozenset({"youtube"})
+
+# How long to watch remote processing after the upload itself finished.
+TIKTOK_PUBLISH_TIMEOUT_SECONDS = 120
+INSTAGRAM_GRAPH_PROCESSING_TIMEOUT_SECONDS = 180
+
+# Release tasks held so they are not garbage collected.
+_pending_cleanups: set[asyncio.Task] = set()
+
+
+@dataclass
+class Runtime:
+    """Long-lived services shared by every job of one route."""
+
+    config: Config
+    executor: JobExecutor
+    store: JobStore
+    cache: DownloadCache
+    poller: StatusPoller
+    scheduler: UploadScheduler
+    resilience: Resilience
+    media_server: Optional[MediaServer] = None
+    # Enabled platforms that cannot upload, see platform_problems().
+    problems: Optional[dict[str, str]] = None
+    name: str = DEFAULT_ROUTE
+
+
+def build_runtime(
+    config: Config, *, name: str = DEFAULT_ROUTE, cache: Optional[DownloadCache] = None
+) -> Runtime:
+    """Create the services for route ``name``; pass another route's ``cache`` to share it."""
+    store = JobStore(config.job_db_path)
+    return Runtime(
+        config=config,
+        executor=JobExecutor(config.job_concurrency, config.job_queue_size),
+        store=store,
+        cache=cache
+        or DownloadCache(
+            Path(config.download_dir),
+            config.download_cache_max_bytes,
+            config.download_disk_budget_bytes,
+        ),
+        poller=StatusPoller(config.status_poll_concurrency),
+        scheduler=UploadScheduler(store, limits_from_config(config)),
+        resilience=Resilience(
+            config.upload_retries,
+            config.circuit_breaker_threshold,
+            config.circuit_breaker_reset_seconds,
+        ),
+        name=name,
+    )
+
+
+def platform_problems(runtime: Runtime) -> dict[str, str]:
+    """Return ``{platform: problem}`` for enabled platforms; checked once."""
+    if runtime.problems is None:
+        runtime.problems = check_platforms(
+            runtime.config, media_server=runtime.media_server is not None
+        )
+    return runtime.problems
+
+
+def enabled_platforms(config: Config) -> list[str]:
+    platforms = []
+    if config.enable_youtube_upload:
+        platforms.append("youtube")
+    if config.enable_tiktok_upload:
+        platforms.append("tiktok")
+    if config.enable_instagram_upload:
+        platforms.append("instagram")
+    return platforms
+
+
+def existing_uploads(
+    config: Config,
+    store: JobStore,
+    *,
+    video_id: Optional[str] = None,
+    content_hash: Optional[str] = None,
+) -> dict[str, str]:
+    """Return earlier uploads of this video; empty when ALLOW_DUPLICATE_UPLOADS is set."""
+    if config.allow_duplicate_uploads:
+        return {}
+    found = store.find_processed(video_id=video_id, content_hash=content_hash)
+    enabled = enabled_platforms(config)
+    return {platform: found[platform] for platform in enabled if platform in found}
+
+
+def _hash_file(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with file_path.open("rb") as source:
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _build_title(info: dict, prefix: str) -> str:
+    base = info.get("title") or "YouTube Short"
+    if prefix:
+        return f"{prefix} {base}".strip()
+    return base
+
+
+def _build_description(info: dict, suffix: str) -> str:
+    base = info.get("description") or ""
+    parts = [base.strip(), suffix.strip()]
+    return "\n\n".join([p for p in parts if p])
+
+
+def _build_caption(info: dict, suffix: str) -> str:
+    base = info.get("description") or info.get("title") or ""
+    parts = [base.strip(), suffix.strip()]
+    return "\n\n".join([p for p in parts if p])
+
+
+def _log_progress(
+    label: str, file_path: Path, forward: Callable[[int, int], None]
+) -> Callable[[int, int], None]:
+    def report(sent: int, total: int) -> None:
+        logging.info("%s upload of %s: %d/%d bytes", label, file_path.name, sent, total)
+        forward(sent, total)
+
+    return report
+
+
+async def _backend(runtime: Runtime, name: str) -> ModuleType:
+    # A first import loads the client library, too slow for the event loop.
+    return await runtime.executor.run_blocking(backend, name)
+
+
+async def _call(
+    runtime: Runtime, platform: str, fn: Callable[..., T], creates_post: bool, **kwargs
+) -> T:
+    """Run blocking ``fn`` under the route's retry policy; see :meth:`Resilience.call`."""
+    return await runtime.resilience.call(
+        platform,
+        functools.partial(runtime.executor.run_blocking, fn, **kwargs),
+        creates_post=creates_post,
+    )
+
+
+def _upload_session_path(runtime: Runtime, job_id: int, platform: str) -> Path:
+    # Job ids are per route database, so other routes prefix their name.
+    prefix = "" if runtime.name == DEFAULT_ROUTE else f"{runtime.name}-"
+    return (
+        Path(runtime.config.download_dir)
+        / ".upload-sessions"
+        / f"{prefix}job-{job_id}-{platform}.json"
+    )
+
+
+async def _upload_youtube(
+    runtime: Runtime,
+    job_id: int,
+    file_path: Path,
+    title: str,
+    description: str,
+    progress: JobProgress,
+) -> str:
+    config = runtime.config
+    youtube = await _backend(runtime, "youtube")
+    return await _call(
+        runtime,
+        "youtube",
+        youtube.upload_short,
+        # The resumable session makes a repeat pick up the same upload.
+        creates_post=False,
+        file_path=file_path,
+        title=title,
+        description=description,
+        privacy_status=config.youtube_privacy_status,
+        category_id=config.youtube_category_id,
+        made_for_kids=config.youtube_made_for_kids,
+        client_secrets_path=config.youtube_client_secrets_path,
+        token_path=config.youtube_token_path,
+        oauth_flow=config.youtube_oauth_flow,
+        chunk_size=config.youtube_upload_chunk_size,
+        max_retries=config.youtube_upload_retries,
+        session_path=_upload_session_path(runtime, job_id, "youtube"),
+        progress=_log_progress(
+            "YouTube", file_path, functools.partial(progress.upload, "youtube")
+        ),
+    )
+
+
+async def _upload_tiktok(
+    runtime: Runtime, file_path: Path, title: str, progress: JobProgress
+) -> str:
+    config = runtime.config
+    tiktok = await _backend(runtime, "tiktok")
+    publish_id = await _call(
+        runtime,
+        "tiktok",
+        tiktok.start_upload,
+        # TikTok publishes once the last chunk arrives.
+        creates_post=True,
+        file_path=file_path,
+        title=title,
+        access_token=config.tiktok_access_token,
+        privacy_level=config.tiktok_privacy_level,
+        disable_comment=config.tiktok_disable_comment,
+        disable_duet=config.tiktok_disable_duet,
+        disable_stitch=config.tiktok_disable_stitch,
+        parallel_chunks=config.tiktok_upload_parallel_chunks,
+        progress=_log_progress(
+            "TikTok", file_path, functools.partial(progress.upload, "tiktok")
+        ),
+    )
+    try:
+        await runtime.poller.wait(
+            "tiktok",
+            functools.partial(tiktok.check_publish_status, config.tiktok_access_token, publish_id),
+            TIKTOK_PUBLISH_TIMEOUT_SECONDS,
+            label=publish_id,
+        )
+    except asyncio.TimeoutError:
+        # Still processing; the publish id is reported all the same.
+        logging.warning("TikTok publish %s still processing", publish_id)
+    return publish_id
+
+
+async def _upload_instagram_graph(runtime: Runtime, file_path: Path, caption: str) -> str:
+    config = runtime.config
+    graph = await _backend(runtime, "instagram_graph")
+    if config.instagram_graph_video_url_template:
+        video_url = config.instagram_graph_video_url_template.format(
+            filename=file_path.name,
+            stem=file_path.stem,
+        )
+    else:
+        # The URL must stay valid while Graph fetches and processes the video.
+        video_url = runtime.media_server.url_for(file_path, config.upload_timeout_seconds)
+
+    creation_id = await _call(
+        runtime,
+        "instagram",
+        graph.create_reel_container,
+        # An unpublished container is never posted; a spare one expires.
+        creates_post=False,
+        ig_user_id=config.instagram_graph_ig_user_id,
+        access_token=config.instagram_graph_access_token,
+        video_url=video_url,
+        caption=caption,
+    )
+    try:
+        await runtime.poller.wait(
+            "instagram",
+            functools.partial(
+                graph.check_container_status, config.instagram_graph_access_token, creation_id
+            ),
+            INSTAGRAM_GRAPH_PROCESSING_TIMEOUT_SECONDS,
+            label=creation_id,
+        )
+    except asyncio.TimeoutError as exc:
+        raise graph.InstagramGraphUploadError("Instagram Graph media processing timed out") from exc
+
+    return await _call(
+        runtime,
+        "instagram",
+        graph.publish_container,
+        creates_post=True,
+        ig_user_id=config.instagram_graph_ig_user_id,
+        access_token=config.instagram_graph_access_token,
+        creation_id=creation_id,
+    )
+
+
+async def _upload_instagrapi(runtime: Runtime, file_path: Path, caption: str) -> str:
+    config = runtime.config
+    instagram = await _backend(runtime, "instagram")
+    return await _call(
+        runtime,
+        "instagram",
+        instagram.upload_reel,
+        creates_post=True,
+        file_path=file_path,
+        caption=caption,
+        username=config.instagram_username,
+        password=config.instagram_password,
+        session_id=config.instagram_session_id,
+        session_path=config.instagram_session_path,
+    )
+
+
+def format_result(platform: str, result_id: str) -> str:
+    if platform == "youtube":
+        return f"YouTube: https://youtu.be/{result_id}"
+    if platform == "tiktok":
+        return f"TikTok publish id: {result_id}"
+    return f"Instagram reel media id: {result_id}"
+
+
+@dataclass(frozen=True)
+class PlannedUpload:
+    """One enabled platform: an upload returning the post id, or a known failure."""
+
+    platform: str
+    log_label: str
+    upload: Optional[Callable[[], Awaitable[str]]] = None
+    failure: Optional[str] = None
+
+
+async def _prepare_media(
+    runtime: Runtime, video_id: str, file_path: Path, platforms: list[str]
+) -> tuple[dict[str, Path], list[Path]]:
+    """Pick the file each platform uploads, converting where its profile needs it."""
+    files = {platform: file_path for platform in platforms}
+    profiles = {
+        platform: PLATFORM_PROFILES[platform]
+        for platform in platforms
+        if PLATFORM_PROFILES.get(platform) is not None
+    }
+    if not runtime.config.media_prep or not profiles or not tools_available():
+        return files, []
+
+    executor = runtime.executor
+    try:
+        media = await executor.run_blocking(probe, file_path)
+    except Exception:
+        logging.exception("Failed to probe %s; uploading it as is", file_path)
+        return files, []
+
+    variants = {platform: choose_variant(media, profile) for platform, profile in profiles.items()}
+    needed = sorted({variant for variant in variants.values() if variant})
+    outcomes = await asyncio.gather(
+        *(
+            executor.run_blocking(
+                prepare, runtime.cache, cache_key(video_id), file_path, media, variant
+            )
+            for variant in needed
+        ),
+        return_exceptions=True,
+    )
+    prepared: dict[str, Path] = {}
+    for variant, outcome in zip(needed, outcomes):
+        if isinstance(outcome, BaseException):
+            logging.error("Failed to prepare %s variant of %s: %s", variant, file_path, outcome)
+            continue
+        prepared[variant] = outcome.path
+
+    for platform, variant in variants.items():
+        if variant in prepared:
+            files[platform] = prepared[variant]
+    return files, list(prepared.values())
+
+
+def _plan_uploads(
+    runtime: Runtime,
+    job_id: int,
+    files: dict[str, Path],
+    info: dict,
+    progress: JobProgress,
+    rejected: dict[str, str],
+) -> list[PlannedUpload]:
+    """Plan an upload per enabled platform; ``rejected`` maps platforms to problems."""
+    config = runtime.config
+    title = _build_title(info, config.youtube_title_prefix)
+    description = _build_description(info, config.youtube_description_suffix)
+    caption = _build_caption(info, config.instagram_caption_suffix)
+
+    plan: list[PlannedUpload] = []
+
+    if config.enable_youtube_upload:
+        plan.append(
+            PlannedUpload(
+                "youtube",
+                "YouTube",
+                upload=functools.partial(
+                    _upload_youtube,
+                    runtime,
+                    job_id,
+                    files["youtube"],
+                    title,
+                    description,
+                    progress,
+                ),
+            )
+        )
+
+    if config.enable_tiktok_upload:
+        plan.append(
+            PlannedUpload(
+                "tiktok",
+                "TikTok",
+                upload=functools.partial(
+                    _upload_tiktok, runtime, files["tiktok"], title, progress
+                ),
+            )
+        )
+
+    if config.enable_instagram_upload:
+        if config.instagram_upload_method == "graph":
+            plan.append(
+                PlannedUpload(
+                    "instagram",
+                    "Instagram Graph",
+                    upload=functools.partial(
+                        _upload_instagram_graph, runtime, files["instagram"], caption
+                    ),
+                )
+            )
+        else:
+            plan.append(
+                PlannedUpload(
+                    "instagram",
+                    "Instagram",
+                    upload=functools.partial(
+                        _upload_instagrapi, runtime, files["instagram"], caption
+                    ),
+                )
+            )
+
+    # Known failures stay in the plan.
+    problems = {**platform_problems(runtime), **rejected}
+    return [
+        PlannedUpload(planned.platform, planned.log_label, failure=problems[planned.platform])
+        if planned.platform in problems
+        else planned
+        for planned in plan
+    ]
+
+
+def _hold_until(runtime: Runtime, booking: QuotaBooking) -> Optional[float]:
+    """When ``booking`` may upload if not now: its slot, or when its breaker lets it."""
+    if not runtime.scheduler.is_due(booking):
+        return booking.scheduled_at
+    return runtime.resilience.breaker(booking.platform).retry_at()
+
+
+async def _known_outcome(
+    result: Optional[str], failure: Optional[str]
+) -> tuple[Optional[str], Optional[str]]:
+    return result, failure
+
+
+async def _report_outcome(
+    progress: JobProgress,
+    platform: str,
+    outcome: Awaitable[tuple[Optional[str], Optional[str]]],
+) -> tuple[Optional[str], Optional[str]]:
+    result, failure = await outcome
+    if result or failure:
+        progress.finished(platform, result or failure)
+    return result, failure
+
+
+async def _run_upload(
+    runtime: Runtime,
+    job_id: int,
+    video_id: str,
+    content_hash: str,
+    planned: PlannedUpload,
+    booking: QuotaBooking,
+    started: asyncio.Event,
+) -> str:
+    # Its own task, so the outcome is recorded even after the job timed out on it.
+    store = runtime.store
+    await runtime.scheduler.wait(booking)
+    started.set()
+    store.set_platform_state(job_id, planned.platform, PLATFORM_UPLOADING)
+    try:
+        with STAGE_SECONDS.time(stage="upload", platform=planned.platform):
+            result_id = str(await planned.upload())
+    except CircuitOpen:
+        # Nothing was posted; the job uploads again once the breaker allows.
+        ERRORS.inc(stage="upload", platform=planned.platform)
+        store.set_platform_state(job_id, planned.platform, PLATFORM_PENDING)
+        raise
+    except Exception as exc:
+        ERRORS.inc(stage="upload", platform=planned.platform)
+        store.set_platform_state(job_id, planned.platform, PLATFORM_FAILED, error=str(exc))
+        raise
+    store.set_platform_state(job_id, planned.platform, PLATFORM_UPLOADED, result_id=result_id)
+    store.record_processed(
+        video_id,
+        planned.platform,
+        result_id,
+        content_hash=content_hash,
+        job_id=job_id,
+    )
+    return result_id
+
+
+async def _await_upload(
+    planned: PlannedUpload,
+    future: asyncio.Future,
+    started: asyncio.Event,
+    timeout: float,
+) -> tuple[Optional[str], Optional[str]]:
+    name = PLATFORM_NAMES[planned.platform]
+    # The timeout covers the upload itself, not the wait for its quota slot.
+    slot = asyncio.ensure_future(started.wait())
+    await asyncio.wait({slot, future}, return_when=asyncio.FIRST_COMPLETED)
+    slot.cancel()
+    try:
+        # shield() keeps the upload running so its file is released only after it.
+        result_id = await asyncio.wait_for(asyncio.shield(future), timeout)
+        return format_result(planned.platform, result_id), None
+    except CircuitOpen as exc:
+        # Reported by the job as deferred, not as a failure.
+        logging.warning("%s upload deferred: %s", planned.log_label, exc)
+        return None, None
+    except asyncio.TimeoutError:
+        logging.error("%s upload timed out after %ss", planned.log_label, timeout)
+        return None, f"{name}: timed out after {timeout:g}s"
+    except Exception as exc:
+        logging.exception("%s upload failed", planned.log_label)
+        return None, f"{name}: {exc}"
+
+
+async def _release_when_done(
+    cache: DownloadCache, file_path: Path, futures: list[asyncio.Future]
+) -> None:
+    await asyncio.gather(*futures, return_exceptions=True)
+    cache.release(file_path)
+
+
+def _schedule_release(
+    cache: DownloadCache, file_path: Path, futures: list[asyncio.Future]
+) -> None:
+    task = asyncio.ensure_future(_release_when_done(cache, file_path, futures))
+    _pending_cleanups.add(task)
+    task.add_done_callback(_pending_cleanups.discard)
+
+
+async def process_short(
+    runtime: Runtime, job_id: int, progress: Optional[JobProgress] = None
+) -> tuple[list[str], list[str]]:
+    """Run job ``job_id``: download the Short once and upload it everywhere at once."""
+    config, executor, store = runtime.config, runtime.executor, runtime.store
+    scheduler = runtime.scheduler
+    progress = progress or JobProgress()
+    job = store.get_job(job_id)
+    if job is None:
+        raise RuntimeError(f"Unknown job {job_id}")
+
+    pending = [
+        booking
+        for booking in scheduler.bookings(job_id).values()
+        if booking.started_at is None
+    ]
+    waits = {booking.platform: _hold_until(runtime, booking) for booking in pending}
+    if pending and None not in waits.values():
+        # Nothing can upload yet; don't download or hold a worker meanwhile.
+        raise UploadDeferred(
+            min(waits.values()),
+            list(waits),
+            unavailable=[
+                booking.platform for booking in pending if scheduler.is_due(booking)
+            ],
+        )
+
+    futures: list[asyncio.Future] = []
+    file_path: Path | None = None
+    prepared_files: list[Path] = []
+    started = time.monotonic()
+    try:
+        resumed = None
+        if job.state == JOB_DOWNLOADED and job.file_path and job.info:
+            resumed = runtime.cache.pin(job.file_path)
+        if resumed is not None:
+            # Resumed after its download finished: no extraction, no download.
+            file_path = resumed.path
+            metadata = {**job.info, "filesize": resumed.size}
+            logging.info("Resuming job %s from %s", job_id, file_path)
+        else:
+            # Metadata first: a video no platform takes is never downloaded.
+            try:
+                metadata = await executor.run_blocking(fetch_metadata, job.url, job.video_id)
+            except Exception:
+                ERRORS.inc(stage="extract", platform="youtube")
+                raise
+        rejected = check_content(metadata, enabled_platforms(config))
+        if rejected and set(rejected) >= set(enabled_platforms(config)):
+            raise RuntimeError(
+                "; ".join(
+                    f"{PLATFORM_NAMES[platform]}: {problem}"
+                    for platform, problem in rejected.items()
+                )
+            )
+
+        if file_path is None:
+            try:
+                with STAGE_SECONDS.time(stage="fetch", platform="youtube"):
+                    file_path, info = await executor.run_blocking(
+                        download_short, job.url, job.video_id, runtime.cache, progress.download
+                    )
+            except Exception:
+                ERRORS.inc(stage="download", platform="youtube")
+                raise
+            store.mark_downloaded(job_id, file_path, info)
+
+        with STAGE_SECONDS.time(stage="hash", platform=""):
+            content_hash = await executor.run_blocking(_hash_file, file_path)
+        uploaded = existing_uploads(
+            config, store, video_id=job.video_id, content_hash=content_hash
+        )
+        for platform, previous in job.platforms.items():
+            if previous.state == PLATFORM_UPLOADED and previous.result_id:
+                uploaded[platform] = previous.result_id
+
+        files, prepared_files = await _prepare_media(
+            runtime,
+            job.video_id,
+            file_path,
+            [
+                platform
+                for platform in enabled_platforms(config)
+                if platform not in uploaded and platform not in rejected
+            ],
+        )
+        files = {platform: files.get(platform, file_path) for platform in enabled_platforms(config)}
+        # Titles and captions come from the metadata fetched before the download.
+        plan = _plan_uploads(runtime, job_id, files, metadata, progress, rejected)
+        to_upload = [
+            planned.platform
+            for planned in plan
+            if planned.upload is not None and planned.platform not in uploaded
+        ]
+        for platform in scheduler.bookings(job_id):
+            if platform not in to_upload:
+                scheduler.cancel(job_id, platform)
+        bookings = scheduler.book(job_id, to_upload)
+
+        waiters = []
+        uploads: dict[str, asyncio.Future] = {}
+        deferred: dict[str, float] = {}
+        unavailable: list[str] = []
+        for planned in plan:
+            name = PLATFORM_NAMES[planned.platform]
+            # Each platform's line reaches ``progress`` as soon as it is known.
+            report = functools.partial(_report_outcome, progress, planned.platform)
+            if planned.platform in uploaded:
+                waiters.append(
+                    report(
+                        _known_outcome(
+                            format_result(planned.platform, uploaded[planned.platform]), None
+                        )
+                    )
+                )
+                continue
+            if planned.upload is None:
+                store.set_platform_state(
+                    job_id, planned.platform, PLATFORM_FAILED, error=planned.failure
+                )
+                waiters.append(report(_known_outcome(None, f"{name}: {planned.failure}")))
+                continue
+            booking = bookings[planned.platform]
+            previous = job.platforms.get(planned.platform)
+            if (
+                booking.started_at is not None
+                and previous is not None
+                and previous.state == PLATFORM_FAILED
+            ):
+                # Failed in an earlier run of this job; its quota is spent.
+                waiters.append(report(_known_outcome(None, f"{name}: {previous.error}")))
+                continue
+            if (
+                previous is not None
+                and previous.state == PLATFORM_UPLOADING
+                and planned.platform not in RESUMABLE_PLATFORMS
+            ):
+                # Stopped mid-upload earlier: the post may exist, so it is not sent again.
+                error = "upload was interrupted and may have gone through; not posted again"
+                store.set_platform_state(job_id, planned.platform, PLATFORM_FAILED, error=error)
+                waiters.append(report(_known_outcome(None, f"{name}: {error}")))
+                continue
+            if booking.started_at is None and not scheduler.is_due(booking):
+                deferred[planned.platform] = booking.scheduled_at
+                continue
+            retry_at = runtime.resilience.breaker(planned.platform).retry_at()
+            if retry_at is not None:
+                deferred[planned.platform] = retry_at
+                unavailable.append(planned.platform)
+                continue
+            slot_granted = asyncio.Event()
+            future = asyncio.ensure_future(
+                _run_upload(
+                    runtime, job_id, job.video_id, content_hash, planned, booking, slot_granted
+                )
+            )
+            futures.append(future)
+            uploads[planned.platform] = future
+            waiters.append(
+                report(
+                    _await_upload(
+                        planned, future, slot_granted, config.upload_timeout_seconds
+                    )
+                )
+            )
+
+        results: list[str] = []
+        failures: list[str] = []
+        for result, failure in await asyncio.gather(*waiters):
+            if result:
+                results.append(result)
+            if failure:
+                failures.append(failure)
+
+        for platform, future in uploads.items():
+            if future.done() and not future.cancelled():
+                exc = future.exception()
+                if isinstance(exc, CircuitOpen):
+                    deferred[platform] = exc.retry_at
+                    unavailable.append(platform)
+
+        if deferred:
+            raise UploadDeferred(
+                min(deferred.values()), list(deferred), results, failures, unavailable
+            )
+
+        if not results and failures:
+            raise RuntimeError("; ".join(failures))
+
+        store.finish(job_id, JOB_DONE, "; ".join(failures) or None)
+        JOBS_FINISHED.inc(state=JOB_DONE)
+        STAGE_SECONDS.observe(time.monotonic() - started, stage="job", platform="")
+        return results, failures
+    except UploadDeferred:
+        raise
+    except asyncio.CancelledError:
+        # Uploads outlive a timeout but not a cancelled job.
+        for future in futures:
+            future.cancel()
+        raise
+    except Exception as exc:
+        store.finish(job_id, JOB_FAILED, str(exc))
+        scheduler.cancel_unstarted(job_id)
+        JOBS_FINISHED.inc(state=JOB_FAILED)
+        STAGE_SECONDS.observe(time.monotonic() - started, stage="job", platform="")
+        raise
+    finally:
+        if file_path is not None:
+            for path in [file_path, *prepared_files]:
+                _schedule_release(runtime.cache, path, futures)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import functools
+import importlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import ModuleType
+from typing import Iterable, Optional
+
+from .config import Config
+from .downloader import estimated_size
+from .metrics import STAGE_SECONDS
+
+# Uploader modules by backend name, imported on first use.
+BACKEND_MODULES = {
+    "youtube": ".youtube",
+    "tiktok": ".tiktok",
+    "instagram": ".instagram",
+    "instagram_graph": ".instagram_graph",
+}
+
+_import_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ContentLimits:
+    """What a platform accepts as a short vertical video."""
+
+    max_seconds: float
+    min_seconds: float = 0
+    # Widest accepted width/height ratio.
+    max_aspect: Optional[float] = None
+    max_bytes: Optional[int] = None
+
+
+CONTENT_LIMITS = {
+    # Longer or landscape uploads become regular videos, not Shorts.
+    "youtube": ContentLimits(max_seconds=180, max_aspect=1.0),
+    "tiktok": ContentLimits(max_seconds=600, min_seconds=3, max_bytes=4 * 1024**3),
+    "instagram": ContentLimits(max_seconds=900, min_seconds=3, max_bytes=300 * 1024**2),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _import(name: str) -> ModuleType:
+    started = time.monotonic()
+    module = importlib.import_module(BACKEND_MODULES[name], __package__)
+    elapsed = time.monotonic() - started
+    STAGE_SECONDS.observe(elapsed, stage="import", platform=name)
+    logging.info("Loaded %s backend in %.2fs", name, elapsed)
+    return module
+
+
+def backend(name: str) -> ModuleType:
+    """Return the uploader module for ``name``, importing it on first use."""
+    # The import lock keeps two threads from both timing the same import.
+    with _import_lock:
+        return _import(name)
+
+
+def backends_for(config: Config) -> list[str]:
+    names = []
+    if config.enable_youtube_upload:
+        names.append("youtube")
+    if config.enable_tiktok_upload:
+        names.append("tiktok")
+    if config.enable_instagram_upload:
+        names.append(
+            "instagram_graph" if config.instagram_upload_method == "graph" else "instagram"
+        )
+    return names
+
+
+def preload(names: Iterable[str]) -> None:
+    """Import ``names`` ahead of the first upload; failures are left for that upload."""
+    for name in names:
+        try:
+            backend(name)
+        except Exception:
+            logging.exception("Failed to load %s backend", name)
+
+
+def _format_duration(seconds: float) -> str:
+    return f"{int(seconds) // 60}:{int(seconds) % 60:02d}"
+
+
+def check_content(info: dict, platforms: Iterable[str]) -> dict[str, str]:
+    """Return ``{platform: problem}`` for ``platforms`` that would reject ``info``."""
+    duration = info.get("duration") or 0
+    width, height = info.get("width") or 0, info.get("height") or 0
+    size = estimated_size(info)
+    problems: dict[str, str] = {}
+    for platform in platforms:
+        limits = CONTENT_LIMITS.get(platform)
+        if limits is None:
+            continue
+        if duration and duration > limits.max_seconds:
+            problems[platform] = (
+                f"the video is {_format_duration(duration)} long, "
+                f"the limit is {_format_duration(limits.max_seconds)}"
+            )
+        elif duration and duration < limits.min_seconds:
+            problems[platform] = (
+                f"the video is {duration:.0f}s long, the minimum is {limits.min_seconds:.0f}s"
+            )
+        elif limits.max_aspect and width and height and width / height > limits.max_aspect:
+            problems[platform] = f"the video is landscape ({width}x{height})"
+        elif limits.max_bytes and size > limits.max_bytes:
+            problems[platform] = (
+                f"the video is about {size / 2**20:.0f} MiB, "
+                f"the limit is {limits.max_bytes / 2**20:.0f} MiB"
+            )
+    return problems
+
+
+def check_platforms(config: Config, *, media_server: bool) -> dict[str, str]:
+    """Return ``{platform: problem}`` for enabled platforms that cannot upload."""
+    problems: dict[str, str] = {}
+    if config.enable_youtube_upload and not (
+        Path(config.youtube_token_path).exists()
+        or Path(config.youtube_client_secrets_path).exists()
+    ):
+        problems["youtube"] = (
+            f"neither {config.youtube_token_path} nor {config.youtube_client_secrets_path} exists"
+        )
+    if config.enable_tiktok_upload and not config.tiktok_access_token:
+        problems["tiktok"] = "missing TIKTOK_ACCESS_TOKEN"
+    if config.enable_instagram_upload:
+        if config.instagram_upload_method == "graph":
+            if (
+                not config.instagram_graph_access_token
+                or not config.instagram_graph_ig_user_id
+                or not (config.instagram_graph_video_url_template or media_server)
+            ):
+                problems["instagram"] = (
+                    "graph method requires INSTAGRAM_GRAPH_ACCESS_TOKEN, "
+                    "INSTAGRAM_GRAPH_IG_USER_ID, and INSTAGRAM_GRAPH_VIDEO_URL_TEMPLATE "
+                    "or MEDIA_SERVER_PUBLIC_URL"
+                )
+        elif not config.instagram_username and not config.instagram_session_id:
+            problems["instagram"] = (
+                "missing auth. Set INSTAGRAM_SESSION_ID or INSTAGRAM_USERNAME/INSTAGRAM_PASSWORD"
+            )
+    return problems
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, Optional, TypeVar
+
+from .metrics import ERRORS, STAGE_SECONDS
+from .resilience import is_transient
+
+T = TypeVar("T")
+
+INITIAL_DELAY_SECONDS = 3.0
+MAX_DELAY_SECONDS = 30.0
+BACKOFF_FACTOR = 1.5
+JITTER = 0.2
+
+
+class StatusPoller:
+    """Polls blocking ``check`` callables from the event loop until they return a value."""
+
+    def __init__(self, max_concurrent_checks: int) -> None:
+        self.max_concurrent_checks = max(1, max_concurrent_checks)
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._pending: dict[str, int] = {}
+
+    def pending(self, platform: Optional[str] = None) -> int:
+        if platform is not None:
+            return self._pending.get(platform, 0)
+        return sum(self._pending.values())
+
+    def track(
+        self,
+        platform: str,
+        check: Callable[[], Optional[T]],
+        timeout: float,
+        label: str = "",
+    ) -> asyncio.Future:
+        """Poll ``check`` and return a future for its result, failing after ``timeout``."""
+        return asyncio.ensure_future(self._poll(platform, check, timeout, label))
+
+    async def wait(
+        self,
+        platform: str,
+        check: Callable[[], Optional[T]],
+        timeout: float,
+        label: str = "",
+    ) -> T:
+        return await self.track(platform, check, timeout, label)
+
+    def _semaphore(self, platform: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(platform)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrent_checks)
+            self._semaphores[platform] = semaphore
+        return semaphore
+
+    async def _poll(
+        self,
+        platform: str,
+        check: Callable[[], Optional[T]],
+        timeout: float,
+        label: str,
+    ) -> T:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        delay = INITIAL_DELAY_SECONDS
+        started = time.monotonic()
+        self._pending[platform] = self._pending.get(platform, 0) + 1
+        try:
+            while True:
+                async with self._semaphore(platform):
+                    check_started = time.monotonic()
+                    try:
+                        result = await loop.run_in_executor(None, check)
+                    except Exception as exc:
+                        ERRORS.inc(stage="status_check", platform=platform)
+                        if not is_transient(exc) or loop.time() >= deadline:
+                            raise
+                        logging.warning("%s %s status check failed: %s", platform, label, exc)
+                        result = None
+                    finally:
+                        STAGE_SECONDS.observe(
+                            time.monotonic() - check_started,
+                            stage="status_check",
+                            platform=platform,
+                        )
+                if result is not None:
+                    STAGE_SECONDS.observe(
+                        time.monotonic() - started, stage="processing", platform=platform
+                    )
+                    return result
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    name = f"{platform} {label}" if label else platform
+                    raise asyncio.TimeoutError(f"{name} still processing after {timeout:g}s")
+                sleep_for = delay * random.uniform(1 - JITTER, 1 + JITTER)
+                logging.debug("%s %s pending, next check in %.1fs", platform, label, sleep_for)
+                await asyncio.sleep(min(sleep_for, remaining))
+                delay = min(MAX_DELAY_SECONDS, delay * BACKOFF_FACTOR)
+        finally:
+            self._pending[platform] -= 1
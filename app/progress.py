@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, RetryAfter
+
+from .metrics import ERRORS
+
+
+class JobProgress:
+    """Receives a job's progress; ``download`` and ``upload`` may run in threads."""
+
+    def download(self, done: int, total: Optional[int]) -> None:
+        pass
+
+    def upload(self, platform: str, sent: int, total: int) -> None:
+        pass
+
+    def finished(self, platform: str, line: str) -> None:
+        pass
+
+
+class EditThrottle:
+    """Sends edits at most once per ``interval`` per chat, keeping only the newest text."""
+
+    def __init__(self, bot: Bot, interval: float) -> None:
+        self.bot = bot
+        self.interval = interval
+        self._pending: dict[tuple[int, int], str] = {}
+        self._next_at: dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def edit(self, chat_id: int, message_id: int, text: str) -> None:
+        # Assigning to an existing key keeps its place in the queue.
+        self._pending[(chat_id, message_id)] = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        self._wakeup.set()
+
+    async def close(self) -> None:
+        """Send what is still waiting, then stop."""
+        while self._pending and self._task is not None and not self._task.done():
+            await asyncio.sleep(self.interval)
+        if self._task is not None:
+            self._task.cancel()
+
+    def _next_ready(self, now: float) -> tuple[Optional[tuple[int, int]], float]:
+        wait = float("inf")
+        for key in self._pending:
+            ready_at = self._next_at.get(key[0], 0.0)
+            if ready_at <= now:
+                return key, 0.0
+            wait = min(wait, ready_at - now)
+        return None, wait
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            key, wait = self._next_ready(time.monotonic())
+            if key is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            chat_id, message_id = key
+            text = self._pending.pop(key)
+            self._next_at[chat_id] = time.monotonic() + self.interval
+            try:
+                await self.bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text)
+            except RetryAfter as exc:
+                delay = exc.retry_after
+                delay = delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+                self._next_at[chat_id] = time.monotonic() + delay
+                # Resend unless a newer text arrived meanwhile.
+                self._pending.setdefault(key, text)
+            except BadRequest as exc:
+                if "not modified" not in str(exc).lower():
+                    ERRORS.inc(stage="status_edit", platform="telegram")
+                    logging.warning("Failed to edit status message %s: %s", message_id, exc)
+            except Exception:
+                ERRORS.inc(stage="status_edit", platform="telegram")
+                logging.warning("Failed to edit status message %s", message_id, exc_info=True)
+
+
+class StatusMessage(JobProgress):
+    """One job's status message, edited in place through ``throttle``."""
+
+    def __init__(
+        self, throttle: EditThrottle, chat_id: int, header: str, names: dict[str, str]
+    ) -> None:
+        self.throttle = throttle
+        self.chat_id = chat_id
+        self.header = header
+        self.names = names
+        self.message_id: Optional[int] = None
+        self._loop = asyncio.get_running_loop()
+        self._lock = threading.Lock()
+        self._download = ""
+        self._platforms: dict[str, str] = {}
+        self._finished: set[str] = set()
+        self._final: Optional[str] = None
+        self._shown = ""
+
+    def attach(self, message_id: int, text: Optional[str] = None) -> None:
+        """Start editing ``message_id``, which was sent with ``text`` (the header by default)."""
+        self.message_id = message_id
+        self._shown = self.header if text is None else text
+        self._push()
+
+    def render(self) -> str:
+        with self._lock:
+            if self._final is not None:
+                return self._final
+            lines = [self.header]
+            if self._download:
+                lines.append(self._download)
+            lines.extend(self._platforms.values())
+        return "\n".join(lines)
+
+    def download(self, done: int, total: Optional[int]) -> None:
+        if total:
+            line = f"Download: {min(100, done * 100 // total)}% of {total / 2**20:.1f} MiB"
+        else:
+            line = f"Download: {done / 2**20:.1f} MiB"
+        with self._lock:
+            self._download = line
+        self._loop.call_soon_threadsafe(self._push)
+
+    def upload(self, platform: str, sent: int, total: int) -> None:
+        percent = sent * 100 // total if total else 100
+        with self._lock:
+            # An upload that outlived its timeout must not hide the reported failure.
+            if platform in self._finished:
+                return
+            self._platforms[platform] = f"{self.names[platform]}: uploading {percent}%"
+        self._loop.call_soon_threadsafe(self._push)
+
+    def finished(self, platform: str, line: str) -> None:
+        with self._lock:
+            self._platforms[platform] = line
+            self._finished.add(platform)
+        self._push()
+
+    def note(self, line: str) -> None:
+        """Show ``line`` under the header in place of the download progress."""
+        with self._lock:
+            self._download = line
+        self._push()
+
+    def finish(self, text: str) -> None:
+        with self._lock:
+            self._final = text
+        self._push()
+
+    def _push(self) -> None:
+        if self.message_id is None:
+            return
+        text = self.render()
+        # Skip updates that would not change the text, e.g. within the same percent.
+        if text == self._shown:
+            return
+        self._shown = text
+        self.throttle.edit(self.chat_id, self.message_id, text)
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+
+from .metrics import ERRORS
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, rate limits and server failures.
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+# Network and throttling errors, matched by class name anywhere in the MRO.
+TRANSIENT_ERROR_NAMES = frozenset(
+    {
+        "ConnectionError",
+        "TimeoutError",
+        "Timeout",
+        "ChunkedEncodingError",
+        "IncompleteRead",
+        "HttpLib2Error",
+        "PleaseWaitFewMinutes",
+        "ClientThrottledError",
+        "ClientConnectionError",
+        "ClientRequestTimeout",
+        "ClientIncompleteReadError",
+    }
+)
+# Errors raised before the request reached the platform; safe to retry for posts.
+UNSENT_ERROR_NAMES = frozenset(
+    {
+        "ConnectTimeout",
+        "ConnectTimeoutError",
+        "NewConnectionError",
+        "NameResolutionError",
+        "ConnectionRefusedError",
+        "gaierror",
+        "PleaseWaitFewMinutes",
+        "ClientThrottledError",
+    }
+)
+UNSENT_STATUS_CODES = frozenset({429})
+MAX_BACKOFF_SECONDS = 60
+# While a breaker's trial call is running, other jobs look again this soon.
+HALF_OPEN_RETRY_SECONDS = 60
+
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling a platform whose breaker is open."""
+
+    def __init__(self, platform: str, retry_at: float) -> None:
+        super().__init__(
+            f"{platform} is failing repeatedly; skipped until "
+            f"{time.strftime('%H:%M UTC', time.gmtime(retry_at))}"
+        )
+        self.platform = platform
+        self.retry_at = retry_at
+
+
+def backoff_delay(attempt: int, cap: float = MAX_BACKOFF_SECONDS) -> float:
+    """Exponential backoff for retry ``attempt`` (from 1), capped, with jitter."""
+    return min(cap, 2**attempt) * random.uniform(0.5, 1.0)
+
+
+def http_status(exc: BaseException) -> Optional[int]:
+    """The HTTP status an exception carries, if any."""
+    resp = getattr(exc, "resp", None)
+    if resp is not None and getattr(resp, "status", None):
+        return int(resp.status)
+    response = getattr(exc, "response", None)
+    if response is not None and getattr(response, "status_code", None):
+        return int(response.status_code)
+    status = getattr(exc, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether the same call may succeed later, judged along the ``__cause__`` chain."""
+    seen: set[int] = set()
+    current: Optional[BaseException] = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        transient = getattr(current, "transient", None)
+        if transient is not None:
+            return bool(transient)
+        status = http_status(current)
+        if status is not None:
+            return status in TRANSIENT_STATUS_CODES
+        if {cls.__name__ for cls in type(current).__mro__} & TRANSIENT_ERROR_NAMES:
+            return True
+        current = current.__cause__
+    return False
+
+
+def _causes(exc: BaseException) -> Iterator[BaseException]:
+    """``exc`` and every error it wraps, including those requests keeps in its args."""
+    seen: set[int] = set()
+    todo = [exc]
+    while todo:
+        current = todo.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        wrapped = [current.__cause__, current.__context__, getattr(current, "reason", None)]
+        wrapped.extend(current.args)
+        todo.extend(item for item in wrapped if isinstance(item, BaseException))
+
+
+def is_unsent(exc: BaseException) -> bool:
+    """Whether ``exc`` shows the platform never acted on the request."""
+    for current in _causes(exc):
+        if http_status(current) in UNSENT_STATUS_CODES:
+            return True
+        if {cls.__name__ for cls in type(current).__mro__} & UNSENT_ERROR_NAMES:
+            return True
+    return False
+
+
+class CircuitBreaker:
+    """Stops calling a platform after ``threshold`` transient failures in a row."""
+
+    def __init__(self, platform: str, threshold: int, reset_seconds: float) -> None:
+        self.platform = platform
+        self.threshold = max(1, threshold)
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def retry_at(self) -> Optional[float]:
+        """When a call may go through again; None if it may now."""
+        if self._opened_at is None:
+            return None
+        reopens = self._opened_at + self.reset_seconds
+        now = time.time()
+        if now < reopens:
+            return reopens
+        return now + HALF_OPEN_RETRY_SECONDS if self._trial else None
+
+    def acquire(self) -> bool:
+        """Claim a call; False while open. Past the reset time, one caller gets the trial."""
+        if self.retry_at() is not None:
+            return False
+        if self._opened_at is not None:
+            self._trial = True
+        return True
+
+    def record(self, ok: bool) -> None:
+        self._trial = False
+        if ok:
+            if self._opened_at is not None:
+                logging.info("%s circuit closed", self.platform)
+            self._failures = 0
+            self._opened_at = None
+            return
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self.threshold:
+            if self._opened_at is None:
+                logging.warning(
+                    "%s circuit open after %d failures; pausing it for %.0fs",
+                    self.platform,
+                    self._failures,
+                    self.reset_seconds,
+                )
+            self._opened_at = time.time()
+
+    def abandon(self) -> None:
+        """Give back a claimed call that never finished."""
+        self._trial = False
+
+
+class Resilience:
+    """Retries and circuit breakers for one route's platform calls."""
+
+    def __init__(self, retries: int, threshold: int, reset_seconds: float) -> None:
+        self.retries = max(0, retries)
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def breaker(self, platform: str) -> CircuitBreaker:
+        breaker = self._breakers.get(platform)
+        if breaker is None:
+            breaker = CircuitBreaker(platform, self.threshold, self.reset_seconds)
+            self._breakers[platform] = breaker
+        return breaker
+
+    async def call(
+        self,
+        platform: str,
+        attempt_call: Callable[[], Awaitable[T]],
+        creates_post: bool = False,
+    ) -> T:
+        """Await ``attempt_call()`` with retries; ``creates_post`` only retries unsent calls."""
+        breaker = self.breaker(platform)
+        attempt = 0
+        while True:
+            if not breaker.acquire():
+                raise CircuitOpen(platform, breaker.retry_at() or time.time())
+            try:
+                result = await attempt_call()
+            except asyncio.CancelledError:
+                breaker.abandon()
+                raise
+            except Exception as exc:
+                transient = is_transient(exc)
+                breaker.record(ok=not transient)
+                if not transient or (creates_post and not is_unsent(exc)):
+                    raise
+                retry_at = breaker.retry_at()
+                if retry_at is not None:
+                    raise CircuitOpen(platform, retry_at) from exc
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                ERRORS.inc(stage="retry", platform=platform)
+                delay = backoff_delay(attempt)
+                logging.warning(
+                    "%s call failed (%s), retry %d/%d in %.1fs",
+                    platform,
+                    exc,
+                    attempt,
+                    self.retries,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+                continue
+            breaker.record(ok=True)
+            return result
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import Config
+
+DEFAULT_ROUTE = "default"
+
+# Process-wide settings; a route can override any other.
+SHARED_SETTINGS = frozenset(
+    {
+        "TELEGRAM_BOT_TOKEN",
+        "TELEGRAM_MODE",
+        "TELEGRAM_WEBHOOK_URL",
+        "TELEGRAM_WEBHOOK_PATH",
+        "TELEGRAM_WEBHOOK_HOST",
+        "TELEGRAM_WEBHOOK_PORT",
+        "TELEGRAM_WEBHOOK_SECRET",
+        "STATUS_EDIT_INTERVAL_SECONDS",
+        "MEDIA_SERVER_PUBLIC_URL",
+        "MEDIA_SERVER_HOST",
+        "MEDIA_SERVER_PORT",
+        "MEDIA_SERVER_SECRET",
+        "METRICS_HOST",
+        "METRICS_PORT",
+        "DOWNLOAD_DIR",
+        "DOWNLOAD_CACHE_MAX_BYTES",
+        "DOWNLOAD_DISK_BUDGET_BYTES",
+        "ROUTES_PATH",
+        "JOB_RUNNER",
+        "JOB_LEASE_SECONDS",
+    }
+)
+
+
+@dataclass(frozen=True)
+class Route:
+    """A source channel and the accounts its Shorts are uploaded to."""
+
+    name: str
+    config: Config
+
+
+def _route_db_path(base: str, name: str) -> str:
+    path = Path(base)
+    return str(path.with_name(f"{path.stem}-{name}{path.suffix}"))
+
+
+def load_routes(config: Config) -> list[Route]:
+    """Return the default route for ``config`` plus those in ``config.routes_path``."""
+    routes = [Route(DEFAULT_ROUTE, config)]
+    if not config.routes_path:
+        return routes
+
+    try:
+        entries = json.loads(Path(config.routes_path).read_text())
+    except (OSError, ValueError) as exc:
+        raise ValueError(f"Cannot read ROUTES_PATH={config.routes_path}: {exc}") from exc
+    if not isinstance(entries, list):
+        raise ValueError("ROUTES_PATH must contain a JSON list of routes.")
+
+    names = {DEFAULT_ROUTE}
+    channels = {config.telegram_channel_id}
+    db_paths = {config.job_db_path}
+    for entry in entries:
+        name = str(entry.get("name", "")).strip()
+        if not name or name in names:
+            raise ValueError(f"Route names must be unique and non-empty, got {name!r}.")
+        overrides = {key: str(value) for key, value in (entry.get("env") or {}).items()}
+        shared = sorted(SHARED_SETTINGS & set(overrides))
+        if shared:
+            raise ValueError(f"Route {name} cannot override {', '.join(shared)}.")
+
+        environ = {
+            **os.environ,
+            "JOB_DB_PATH": _route_db_path(config.job_db_path, name),
+            **overrides,
+            "TELEGRAM_CHANNEL_ID": str(entry.get("channel_id", "")),
+        }
+        route_config = Config.from_env(environ)
+        if route_config.telegram_channel_id in channels:
+            raise ValueError(
+                f"Route {name}: channel {route_config.telegram_channel_id} is already routed."
+            )
+        if route_config.job_db_path in db_paths:
+            raise ValueError(f"Route {name}: JOB_DB_PATH is already used by another route.")
+        names.add(name)
+        channels.add(route_config.telegram_channel_id)
+        db_paths.add(route_config.job_db_path)
+        routes.append(Route(name, route_config))
+    return routes
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from .config import Config
+from .job_store import JobStore, QuotaBooking
+
+DAY_SECONDS = 24 * 60 * 60
+# Uploads booked this close to now run in the current job run.
+SCHEDULE_SLACK_SECONDS = 60
+# Bookings older than this are dropped from the ledger on startup.
+LEDGER_RETENTION_SECONDS = 2 * DAY_SECONDS
+
+# Quota day start per platform after midnight UTC; YouTube's is a fixed UTC-8.
+QUOTA_DAY_OFFSETS = {"youtube": 8 * 60 * 60}
+
+
+class UploadDeferred(RuntimeError):
+    """Raised by a job whose remaining uploads are booked for ``until``."""
+
+    def __init__(
+        self,
+        until: float,
+        platforms: list[str],
+        results: Optional[list[str]] = None,
+        failures: Optional[list[str]] = None,
+        unavailable: Optional[list[str]] = None,
+    ) -> None:
+        super().__init__(f"{', '.join(platforms)} deferred until {until:.0f}")
+        self.until = until
+        self.platforms = platforms
+        self.results = results or []
+        self.failures = failures or []
+        self.unavailable = unavailable or []
+
+
+@dataclass(frozen=True)
+class PlatformLimit:
+    """Daily quota of one platform and the share of it one upload costs."""
+
+    daily_units: int
+    cost: int
+    burst: int = 1
+
+
+def limits_from_config(config: Config) -> dict[str, PlatformLimit]:
+    return {
+        "youtube": PlatformLimit(
+            config.youtube_daily_quota, config.youtube_upload_quota_cost, config.upload_burst
+        ),
+        "tiktok": PlatformLimit(config.tiktok_daily_uploads, 1, config.upload_burst),
+        "instagram": PlatformLimit(config.instagram_daily_uploads, 1, config.upload_burst),
+    }
+
+
+def _day_start(platform: str, timestamp: float) -> float:
+    offset = QUOTA_DAY_OFFSETS.get(platform, 0)
+    return (timestamp - offset) // DAY_SECONDS * DAY_SECONDS + offset
+
+
+class UploadScheduler:
+    """Books each upload into a per-platform GCRA slot; bookings are the quota ledger."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        limits: dict[str, PlatformLimit],
+        slack_seconds: float = SCHEDULE_SLACK_SECONDS,
+    ) -> None:
+        self.store = store
+        self.limits = limits
+        self.slack_seconds = slack_seconds
+        self._tat: dict[str, float] = {}
+
+    def prune(self) -> None:
+        self.store.prune_quota_bookings(time.time() - LEDGER_RETENTION_SECONDS)
+
+    def bookings(self, job_id: int) -> dict[str, QuotaBooking]:
+        return {booking.platform: booking for booking in self.store.quota_bookings(job_id)}
+
+    def book(self, job_id: int, platforms: Iterable[str]) -> dict[str, QuotaBooking]:
+        """Reserve a slot per platform for ``job_id``; existing bookings are kept."""
+        bookings = self.bookings(job_id)
+        for platform in platforms:
+            if platform not in bookings:
+                bookings[platform] = self._book(job_id, platform)
+        return bookings
+
+    def cancel(self, job_id: int, platform: str) -> None:
+        """Give an unused slot's units back to the ledger."""
+        booking = self.bookings(job_id).get(platform)
+        if booking is not None and booking.started_at is None:
+            self.store.delete_quota_booking(job_id, platform)
+            self._rewind(platform)
+
+    def cancel_unstarted(self, job_id: int) -> None:
+        for platform in self.bookings(job_id):
+            self.cancel(job_id, platform)
+
+    def is_due(self, booking: QuotaBooking) -> bool:
+        return self.is_due_at(booking.scheduled_at)
+
+    def is_due_at(self, timestamp: float) -> bool:
+        return timestamp <= time.time() + self.slack_seconds
+
+    def eta(self, job_id: int) -> Optional[float]:
+        """Return when the job's last pending upload may start, if any is pending."""
+        pending = [
+            booking.scheduled_at
+            for booking in self.store.quota_bookings(job_id)
+            if booking.started_at is None
+        ]
+        return max(pending) if pending else None
+
+    async def wait(self, booking: QuotaBooking) -> None:
+        """Sleep until ``booking`` is due, then mark its units as spent."""
+        delay = booking.scheduled_at - time.time()
+        if delay > 0:
+            logging.info(
+                "Waiting %.0fs for the %s upload slot of job %s",
+                delay,
+                booking.platform,
+                booking.job_id,
+            )
+            await asyncio.sleep(delay)
+        self.store.start_quota_booking(booking.job_id, booking.platform)
+
+    def _book(self, job_id: int, platform: str) -> QuotaBooking:
+        now = time.time()
+        limit = self.limits.get(platform)
+        if limit is None or limit.daily_units <= 0:
+            booking = QuotaBooking(job_id, platform, now, _day_start(platform, now), 0)
+            self.store.add_quota_booking(booking)
+            return booking
+
+        cost, interval = _cost_interval(limit)
+        tolerance = (max(1, limit.burst) - 1) * interval
+        # Other processes book into the same ledger.
+        last = self.store.last_quota_slot(platform)
+        tat = max(self._tat.get(platform, now), last + interval if last is not None else now, now)
+
+        slot = max(now, tat - tolerance)
+        day = _day_start(platform, slot)
+        while self.store.quota_used(platform, day) + cost > limit.daily_units:
+            day += DAY_SECONDS
+            slot = max(slot, day)
+        self._tat[platform] = max(tat, slot) + interval
+
+        booking = QuotaBooking(job_id, platform, slot, day, cost)
+        self.store.add_quota_booking(booking)
+        if slot > now + self.slack_seconds:
+            logging.info("Booked %s upload of job %s for %.0fs from now", platform, job_id, slot - now)
+        return booking
+
+    def _rewind(self, platform: str) -> None:
+        """Rebuild the arrival time from the ledger, so a freed slot is not kept."""
+        limit = self.limits.get(platform)
+        self._tat.pop(platform, None)
+        if limit is None or limit.daily_units <= 0:
+            return
+        _, interval = _cost_interval(limit)
+        slots = sorted(
+            booking.scheduled_at
+            for booking in self.store.quota_bookings()
+            if booking.platform == platform
+        )
+        for slot in slots:
+            self._tat[platform] = max(self._tat.get(platform, slot), slot) + interval
+
+
+def _cost_interval(limit: PlatformLimit) -> tuple[int, float]:
+    """Units one upload books and the seconds the bucket takes to refill them."""
+    cost = min(max(1, limit.cost), limit.daily_units)
+    return cost, cost * DAY_SECONDS / limit.daily_units
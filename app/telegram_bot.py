@@ -1,21 +1,65 @@
+import asyncio
+import functools
 import logging
 import re
+import secrets
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Optional
 
-from telegram import Update
-from telegram.ext import ApplicationBuilder, ContextTypes, MessageHandler, filters
+from telegram import Bot, Update
+from telegram.ext import (
+    Application,
+    ApplicationBuilder,
+    ContextTypes,
+    MessageHandler,
+    filters,
+)
 
+from . import metrics
 from .config import Config
-from .downloader import download_short
-from .instagram_graph import upload_reel_from_url
-from .instagram import upload_reel
-from .tiktok import upload_video as upload_tiktok_video
-from .youtube import upload_short
+from .downloader import fetch_metadata, get_engine
+from .job_store import JOB_DONE, JOB_FAILED, PLATFORM_FAILED, PLATFORM_UPLOADED, JobRecord
+from .http_server import HttpServer
+from .jobs import JobQueueFull
+from .media_server import MediaServer
+from .platforms import backends_for, check_content, preload
+from .progress import EditThrottle, StatusMessage
+from .routes import load_routes
+from .scheduler import UploadDeferred
+from .webhook import TelegramWebhook
+from .pipeline import (
+    PLATFORM_NAMES,
+    Runtime,
+    build_runtime,
+    enabled_platforms,
+    existing_uploads,
+    format_result,
+    platform_problems,
+    process_short,
+)
 
 YOUTUBE_URL_RE = re.compile(
     r"(?:https?://)?(?:www\.)?(?:youtube\.com/shorts/|youtu\.be/)([A-Za-z0-9_-]{6,})"
 )
+COLLECTION_URL_RE = re.compile(
+    r"(?:https?://)?(?:www\.|m\.)?youtube\.com/"
+    r"(?:playlist\?list=[A-Za-z0-9_-]+"
+    r"|(?:@[\w.-]+|channel/[A-Za-z0-9_-]+|c/[\w.-]+)(?:/shorts)?)"
+)
+
+# Telegram rejects messages longer than this.
+MAX_MESSAGE_LENGTH = 4096
+# Minimum time between edits of a batch progress message.
+BATCH_EDIT_INTERVAL_SECONDS = 10
+# How often the bot checks on batch jobs that worker processes run.
+BATCH_POLL_SECONDS = 5
+# With JOB_RUNNER=workers, a new job is held under this name until its message exists.
+FRONTEND_OWNER = "bot"
+FRONTEND_HOLD_SECONDS = 60
+
+STATUS_HEADER = "Downloading and uploading the Short. This may take a few minutes..."
 
 
 def extract_video_id(text: str) -> Optional[str]:
@@ -25,175 +69,628 @@ def extract_video_id(text: str) -> Optional[str]:
     return match.group(1)
 
 
-def _build_title(info: dict, prefix: str) -> str:
-    base = info.get("title") or "YouTube Short"
-    if prefix:
-        return f"{prefix} {base}".strip()
-    return base
+def _unique(items: Iterable[str]) -> list[str]:
+    return list(dict.fromkeys(items))
 
 
-def _build_description(info: dict, suffix: str) -> str:
-    base = info.get("description") or ""
-    parts = [base.strip(), suffix.strip()]
-    return "\n\n".join([p for p in parts if p])
+def extract_links(text: str) -> tuple[list[str], list[str]]:
+    """Return the Shorts video ids and the playlist/channel URLs in ``text``."""
+    video_ids = _unique(match.group(1) for match in YOUTUBE_URL_RE.finditer(text))
+    collections = []
+    for match in COLLECTION_URL_RE.finditer(text):
+        url = match.group(0)
+        if not url.startswith("http"):
+            url = f"https://{url}"
+        if "/playlist?" not in url and not url.endswith("/shorts"):
+            url = f"{url}/shorts"
+        collections.append(url)
+    return video_ids, _unique(collections)
 
 
-def _build_caption(info: dict, suffix: str) -> str:
-    base = info.get("description") or info.get("title") or ""
-    parts = [base.strip(), suffix.strip()]
-    return "\n\n".join([p for p in parts if p])
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
 
 
-async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    config: Config = context.application.bot_data["config"]
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_MESSAGE_LENGTH:
+        return text
+    return text[: MAX_MESSAGE_LENGTH - 2] + "\n…"
+
+
+def _format_response(results: list[str], failures: list[str]) -> str:
+    response_lines = []
+    if results:
+        response_lines.append("Upload results:")
+        response_lines.extend(results)
+    if failures:
+        response_lines.append("")
+        response_lines.append("Failed:")
+        response_lines.extend(failures)
+    return "\n".join(response_lines)
+
+
+class _Batch:
+    """Reports a bulk submission through one progress message and a summary."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        throttle: EditThrottle,
+        chat_id: int,
+        already_uploaded: int,
+        expand_failures: list[str],
+    ) -> None:
+        self.bot = bot
+        self.throttle = throttle
+        self.chat_id = chat_id
+        self.already_uploaded = already_uploaded
+        self.expand_failures = expand_failures
+        self.video_ids: dict[int, str] = {}
+        self.total = 0
+        self.done = 0
+        self.uploaded = 0
+        self.failures: list[str] = []
+        self.eta: Optional[float] = None
+        self._message_id: Optional[int] = None
+        self._last_edit = 0.0
+
+    def add(self, job_id: int, video_id: str) -> None:
+        self.video_ids[job_id] = video_id
+
+    def _progress_text(self) -> str:
+        text = (
+            f"Bulk upload: {self.done}/{self.total} Shorts processed, "
+            f"{self.uploaded} uploaded, {len(self.failures)} with failures"
+        )
+        if self.already_uploaded:
+            text += f", {self.already_uploaded} already uploaded before"
+        text += "."
+        if self.eta is not None and self.eta > time.time():
+            text += f" Upload quota spreads the rest until about {_format_time(self.eta)}."
+        return text
+
+    async def start(self, total: int, eta: Optional[float] = None) -> None:
+        self.total = total
+        self.eta = eta
+        if not total:
+            await self._send_summary()
+            return
+        message = await self.bot.send_message(chat_id=self.chat_id, text=self._progress_text())
+        self._message_id = message.message_id
+        self._last_edit = time.monotonic()
+
+    async def job_finished(
+        self, job_id: int, results: list[str], failures: list[str]
+    ) -> None:
+        video_id = self.video_ids.get(job_id, str(job_id))
+        self.done += 1
+        if failures:
+            self.failures.extend(f"{video_id}: {failure}" for failure in failures)
+        elif results:
+            self.uploaded += 1
+
+        if self.done >= self.total:
+            await self._edit_progress()
+            await self._send_summary()
+        elif time.monotonic() - self._last_edit >= BATCH_EDIT_INTERVAL_SECONDS:
+            await self._edit_progress()
+
+    async def _edit_progress(self) -> None:
+        if self._message_id is None:
+            return
+        self._last_edit = time.monotonic()
+        self.throttle.edit(self.chat_id, self._message_id, self._progress_text())
+
+    async def _send_summary(self) -> None:
+        lines = [
+            "Bulk upload finished:",
+            f"Processed: {self.total}",
+            f"Uploaded: {self.uploaded}",
+            f"Already uploaded before: {self.already_uploaded}",
+        ]
+        failures = self.expand_failures + self.failures
+        if failures:
+            lines.append("")
+            lines.append("Failed:")
+            lines.extend(failures)
+        await self.bot.send_message(chat_id=self.chat_id, text=_truncate("\n".join(lines)))
+
+
+def _deferral_note(deferred: UploadDeferred) -> str:
+    lines = []
+    scheduled = [p for p in deferred.platforms if p not in deferred.unavailable]
+    if scheduled:
+        names = ", ".join(PLATFORM_NAMES[platform] for platform in scheduled)
+        lines.append(
+            f"{names}: scheduled for about {_format_time(deferred.until)} "
+            "to stay within the daily upload quota."
+        )
+    if deferred.unavailable:
+        names = ", ".join(PLATFORM_NAMES[platform] for platform in deferred.unavailable)
+        lines.append(
+            f"{names}: failing repeatedly, trying again at about "
+            f"{_format_time(deferred.until)}."
+        )
+    return "\n".join(lines)
+
+
+async def run_job(
+    bot: Bot,
+    runtime: Runtime,
+    job_id: int,
+    batch: Optional[_Batch] = None,
+    announced: bool = False,
+    status: Optional[StatusMessage] = None,
+    defer: Optional[Callable[[float], None]] = None,
+) -> None:
+    """Run a job and report it to its batch, its ``status`` message or new messages."""
+    config = runtime.config
+    try:
+        results, failures = await process_short(runtime, job_id, status)
+    except UploadDeferred as deferred:
+        if defer is None:
+            runtime.executor.submit_at(
+                functools.partial(run_job, bot, runtime, job_id, batch, True, status),
+                deferred.until,
+            )
+        else:
+            defer(deferred.until)
+        note = _deferral_note(deferred)
+        if status is not None:
+            status.note(note)
+        elif batch is None and not announced:
+            lines = deferred.results + deferred.failures + [note]
+            await bot.send_message(chat_id=config.telegram_channel_id, text="\n".join(lines))
+        return
+    except Exception as exc:
+        logging.exception("Failed to process short")
+        if batch is not None:
+            await batch.job_finished(job_id, [], [str(exc)])
+            return
+        text = f"Failed to upload the Short: {exc}"
+        if status is not None:
+            status.finish(_truncate(text))
+            return
+        await bot.send_message(chat_id=config.telegram_channel_id, text=text)
+        return
+
+    if batch is not None:
+        await batch.job_finished(job_id, results, failures)
+        return
 
+    text = _format_response(results, failures)
+    if status is not None:
+        status.finish(_truncate(text or "Done."))
+    elif text:
+        await bot.send_message(chat_id=config.telegram_channel_id, text=text)
+
+
+def _book_uploads(
+    runtime: Runtime, job_id: int, video_id: str, skip: Iterable[str] = ()
+) -> Optional[float]:
+    """Book a new job's uploads, except ``skip``; return its expected publish time."""
+    existing = existing_uploads(runtime.config, runtime.store, video_id=video_id)
+    platforms = [
+        platform
+        for platform in enabled_platforms(runtime.config)
+        if platform not in existing and platform not in skip
+    ]
+    runtime.scheduler.book(job_id, platforms)
+    return runtime.scheduler.eta(job_id)
+
+
+def _status_header(
+    runtime: Runtime, job_id: int, video_id: str, rejected: dict[str, str]
+) -> str:
+    """Book a new job's uploads and return the first text of its status message."""
+    eta = _book_uploads(runtime, job_id, video_id, rejected)
+    if eta is not None and not runtime.scheduler.is_due_at(eta):
+        return (
+            "Queued the Short. To stay within the daily upload quota it will be "
+            f"published at about {_format_time(eta)}."
+        )
+    return STATUS_HEADER
+
+
+def _job_outcome(job: JobRecord) -> tuple[list[str], list[str]]:
+    """Rebuild the result and failure lines of a finished job from the store."""
+    if job.state == JOB_FAILED:
+        return [], [job.error or "failed"]
+    results = [
+        format_result(platform, record.result_id)
+        for platform, record in job.platforms.items()
+        if record.state == PLATFORM_UPLOADED and record.result_id
+    ]
+    failures = [
+        f"{PLATFORM_NAMES[platform]}: {record.error}"
+        for platform, record in job.platforms.items()
+        if record.state == PLATFORM_FAILED
+    ]
+    return results, failures
+
+
+def _already_uploaded(runtime: Runtime, video_id: str) -> dict[str, str]:
+    """Return the ledger entries for ``video_id`` if they cover every platform."""
+    config = runtime.config
+    existing = existing_uploads(config, runtime.store, video_id=video_id)
+    if existing and set(existing) >= set(enabled_platforms(config)):
+        return existing
+    return {}
+
+
+async def _run_batch(
+    bot: Bot,
+    runtime: Runtime,
+    throttle: EditThrottle,
+    video_ids: list[str],
+    collections: list[str],
+) -> None:
+    config = runtime.config
+    limit = config.bulk_max_videos
+    engine = get_engine()
+
+    expand_failures = []
+    for url in collections:
+        remaining = limit - len(video_ids)
+        if remaining <= 0:
+            break
+        try:
+            found = await runtime.executor.run_blocking(engine.expand, url, remaining)
+        except Exception as exc:
+            logging.exception("Failed to list %s", url)
+            expand_failures.append(f"{url}: {exc}")
+            continue
+        video_ids = _unique([*video_ids, *found])
+    video_ids = video_ids[:limit]
+
+    pending = [video_id for video_id in video_ids if not _already_uploaded(runtime, video_id)]
+    batch = _Batch(
+        bot,
+        throttle,
+        config.telegram_channel_id,
+        already_uploaded=len(video_ids) - len(pending),
+        expand_failures=expand_failures,
+    )
+
+    # Workers don't report batch jobs; the batch watches the store.
+    workers = config.job_runner == "workers"
+    job_ids = []
+    eta = None
+    for video_id in pending:
+        job_id = runtime.store.create_job(
+            f"https://youtube.com/shorts/{video_id}", video_id, quiet=workers
+        )
+        batch.add(job_id, video_id)
+        job_ids.append(job_id)
+        job_eta = _book_uploads(runtime, job_id, video_id)
+        if job_eta is not None:
+            eta = max(eta or job_eta, job_eta)
+    await batch.start(len(pending), eta)
+
+    if workers:
+        await _watch_batch(runtime, batch, job_ids)
+        return
+    for job_id in job_ids:
+        # Waits for free slots so the batch never overflows the job queue.
+        await runtime.executor.submit_when_ready(
+            functools.partial(run_job, bot, runtime, job_id, batch)
+        )
+
+
+async def _watch_batch(runtime: Runtime, batch: _Batch, job_ids: list[int]) -> None:
+    """Report batch jobs that worker processes run as they finish."""
+    waiting = list(job_ids)
+    while waiting:
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        for job_id in list(waiting):
+            job = runtime.store.get_job(job_id)
+            if job is None or job.state not in (JOB_DONE, JOB_FAILED):
+                continue
+            waiting.remove(job_id)
+            await batch.job_finished(job_id, *_job_outcome(job))
+
+
+def _rejection_lines(rejected: dict[str, str]) -> list[str]:
+    return [f"{PLATFORM_NAMES[platform]}: {problem}" for platform, problem in rejected.items()]
+
+
+async def _queue_for_workers(
+    bot: Bot, runtime: Runtime, url: str, video_id: str, rejected: dict[str, str]
+) -> None:
+    """Queue a single link for the worker processes, which edit its status message."""
+    store = runtime.store
+    # Held until the status message exists for the worker to edit.
+    job_id = store.create_job(
+        url, video_id, held_by=FRONTEND_OWNER, hold_seconds=FRONTEND_HOLD_SECONDS
+    )
+    try:
+        header = _status_header(runtime, job_id, video_id, rejected)
+        message = await bot.send_message(
+            chat_id=runtime.config.telegram_channel_id,
+            text="\n".join([header, *_rejection_lines(rejected)]),
+        )
+        store.set_status_message(job_id, message.message_id)
+    finally:
+        store.release_lease(job_id, FRONTEND_OWNER)
+
+
+def _runtime_for(app: Application, chat_id: int) -> Optional[Runtime]:
+    """Return the route serving ``chat_id``, or None for chats without one."""
+    return app.bot_data["runtimes"].get(chat_id)
+
+
+async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     msg = update.channel_post or update.message
-    if not msg or msg.chat_id != config.telegram_channel_id:
+    if not msg:
+        return
+    runtime = _runtime_for(context.application, msg.chat_id)
+    if runtime is None:
         return
+    config = runtime.config
 
     if not msg.text:
         return
 
-    video_id = extract_video_id(msg.text)
-    if not video_id:
+    video_ids, collections = extract_links(msg.text)
+    if collections or len(video_ids) > 1:
+        context.application.create_task(
+            _run_batch(
+                context.bot,
+                runtime,
+                context.application.bot_data["status_edits"],
+                video_ids,
+                collections,
+            )
+        )
+        await context.bot.send_message(
+            chat_id=config.telegram_channel_id,
+            text="Collecting the Shorts from your message. Progress follows in one message...",
+        )
         return
 
-    url = f"https://youtube.com/shorts/{video_id}"
-    await context.bot.send_message(
-        chat_id=config.telegram_channel_id,
-        text="Downloading and uploading the Short. This may take a few minutes...",
+    if not video_ids:
+        return
+    # Checking the metadata takes a few seconds; other updates go on meanwhile.
+    context.application.create_task(
+        _submit_short(
+            context.bot, runtime, context.application.bot_data["status_edits"], video_ids[0]
+        )
     )
 
-    file_path: Path | None = None
+
+async def _submit_short(
+    bot: Bot, runtime: Runtime, throttle: EditThrottle, video_id: str
+) -> None:
+    """Check a single link against the platforms' limits and queue it."""
+    config = runtime.config
+    existing = _already_uploaded(runtime, video_id)
+    if existing:
+        lines = ["Already uploaded:"]
+        lines.extend(format_result(platform, result_id) for platform, result_id in existing.items())
+        await bot.send_message(
+            chat_id=config.telegram_channel_id,
+            text="\n".join(lines),
+        )
+        return
+
+    url = f"https://youtube.com/shorts/{video_id}"
     try:
-        file_path, info = download_short(url, config.download_dir)
-        title = _build_title(info, config.youtube_title_prefix)
-        description = _build_description(info, config.youtube_description_suffix)
-        caption = _build_caption(info, config.instagram_caption_suffix)
-
-        results: list[str] = []
-        failures: list[str] = []
-
-        if config.enable_youtube_upload:
-            try:
-                upload_id = upload_short(
-                    file_path=file_path,
-                    title=title,
-                    description=description,
-                    privacy_status=config.youtube_privacy_status,
-                    category_id=config.youtube_category_id,
-                    made_for_kids=config.youtube_made_for_kids,
-                    client_secrets_path=config.youtube_client_secrets_path,
-                    token_path=config.youtube_token_path,
-                    oauth_flow=config.youtube_oauth_flow,
-                )
-                results.append(f"YouTube: https://youtu.be/{upload_id}")
-            except Exception as exc:
-                logging.exception("YouTube upload failed")
-                failures.append(f"YouTube: {exc}")
-
-        if config.enable_tiktok_upload:
-            if not config.tiktok_access_token:
-                failures.append("TikTok: missing TIKTOK_ACCESS_TOKEN")
-            else:
-                try:
-                    publish_id = upload_tiktok_video(
-                        file_path=file_path,
-                        title=title,
-                        access_token=config.tiktok_access_token,
-                        privacy_level=config.tiktok_privacy_level,
-                        disable_comment=config.tiktok_disable_comment,
-                        disable_duet=config.tiktok_disable_duet,
-                        disable_stitch=config.tiktok_disable_stitch,
-                    )
-                    results.append(f"TikTok publish id: {publish_id}")
-                except Exception as exc:
-                    logging.exception("TikTok upload failed")
-                    failures.append(f"TikTok: {exc}")
-
-        if config.enable_instagram_upload:
-            if config.instagram_upload_method == "graph":
-                if (
-                    not config.instagram_graph_access_token
-                    or not config.instagram_graph_ig_user_id
-                    or not config.instagram_graph_video_url_template
-                ):
-                    failures.append(
-                        "Instagram: graph method requires INSTAGRAM_GRAPH_ACCESS_TOKEN, INSTAGRAM_GRAPH_IG_USER_ID, and INSTAGRAM_GRAPH_VIDEO_URL_TEMPLATE"
-                    )
-                else:
-                    try:
-                        video_url = config.instagram_graph_video_url_template.format(
-                            filename=file_path.name,
-                            stem=file_path.stem,
-                        )
-                        media_id = upload_reel_from_url(
-                            ig_user_id=config.instagram_graph_ig_user_id,
-                            access_token=config.instagram_graph_access_token,
-                            video_url=video_url,
-                            caption=caption,
-                        )
-                        results.append(f"Instagram reel media id: {media_id}")
-                    except Exception as exc:
-                        logging.exception("Instagram Graph upload failed")
-                        failures.append(f"Instagram: {exc}")
-            elif config.instagram_upload_method == "instagrapi":
-                if not config.instagram_username and not config.instagram_session_id:
-                    failures.append(
-                        "Instagram: missing auth. Set INSTAGRAM_SESSION_ID or INSTAGRAM_USERNAME/INSTAGRAM_PASSWORD"
-                    )
-                else:
-                    try:
-                        media_id = upload_reel(
-                            file_path=file_path,
-                            caption=caption,
-                            username=config.instagram_username,
-                            password=config.instagram_password,
-                            session_id=config.instagram_session_id,
-                            session_path=config.instagram_session_path,
-                        )
-                        results.append(f"Instagram reel media id: {media_id}")
-                    except Exception as exc:
-                        logging.exception("Instagram upload failed")
-                        failures.append(f"Instagram: {exc}")
-            else:
-                failures.append(
-                    f"Instagram: unsupported INSTAGRAM_UPLOAD_METHOD={config.instagram_upload_method}"
-                )
-
-        if not results and failures:
-            raise RuntimeError("; ".join(failures))
-
-        response_lines = []
-        if results:
-            response_lines.append("Upload results:")
-            response_lines.extend(results)
-        if failures:
-            response_lines.append("")
-            response_lines.append("Failed:")
-            response_lines.extend(failures)
-
-        if response_lines:
-            await context.bot.send_message(
-                chat_id=config.telegram_channel_id,
-                text="\n".join(response_lines),
-            )
+        metadata = await runtime.executor.run_blocking(fetch_metadata, url, video_id)
     except Exception as exc:
-        logging.exception("Failed to process short")
-        await context.bot.send_message(
+        logging.warning("Cannot post %s: %s", url, exc)
+        await bot.send_message(
             chat_id=config.telegram_channel_id,
-            text=f"Failed to upload the Short: {exc}",
+            text=_truncate(f"Cannot post this Short: {exc}"),
         )
         return
-    finally:
-        if file_path and file_path.exists():
-            file_path.unlink()
-            logging.info("Deleted downloaded file: %s", file_path)
+    platforms = enabled_platforms(config)
+    rejected = check_content(metadata, platforms)
+    if platforms and set(rejected) >= set(platforms):
+        await bot.send_message(
+            chat_id=config.telegram_channel_id,
+            text="\n".join(["Not posting this Short:", *_rejection_lines(rejected)]),
+        )
+        return
+
+    if config.job_runner == "workers":
+        await _queue_for_workers(bot, runtime, url, video_id, rejected)
+        return
+
+    job_id = runtime.store.create_job(url, video_id)
+    status = StatusMessage(throttle, config.telegram_channel_id, STATUS_HEADER, PLATFORM_NAMES)
+    for platform, line in zip(rejected, _rejection_lines(rejected)):
+        status.finished(platform, line)
+    try:
+        runtime.executor.submit(functools.partial(run_job, bot, runtime, job_id, status=status))
+    except JobQueueFull as exc:
+        logging.warning("Rejected %s: %s", url, exc)
+        runtime.store.finish(job_id, JOB_FAILED, str(exc))
+        await bot.send_message(
+            chat_id=config.telegram_channel_id,
+            text="Too many Shorts are being processed right now. Please post the link again later.",
+        )
+        return
+
+    status.header = _status_header(runtime, job_id, video_id, rejected)
+    text = status.render()
+    message = await bot.send_message(chat_id=config.telegram_channel_id, text=text)
+    status.attach(message.message_id, text)
+
+
+async def handle_queue(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    msg = update.channel_post or update.message
+    if not msg:
+        return
+    runtime = _runtime_for(context.application, msg.chat_id)
+    if runtime is None:
+        return
+    config = runtime.config
+    if not msg.text or msg.text.split()[0].split("@")[0] != "/queue":
+        return
+
+    jobs = runtime.store.unfinished_jobs()
+    if not jobs:
+        text = "No Shorts are queued."
+    else:
+        lines = ["Queued Shorts:"]
+        for job in jobs:
+            slots = [
+                f"{PLATFORM_NAMES[booking.platform]} {_format_time(booking.scheduled_at)}"
+                for booking in runtime.scheduler.bookings(job.id).values()
+                if booking.started_at is None
+            ]
+            lines.append(f"{job.video_id}: {', '.join(slots) or 'uploading'}")
+        text = _truncate("\n".join(lines))
+    await context.bot.send_message(chat_id=config.telegram_channel_id, text=text)
+
+
+async def _resume_unfinished_jobs(app: Application, runtime: Runtime) -> None:
+    unfinished = runtime.store.unfinished_jobs()
+    if not unfinished:
+        return
+
+    logging.info("Resuming %d unfinished job(s) of route %s", len(unfinished), runtime.name)
+    for job in unfinished:
+        # Jobs were admitted before the restart, so they bypass the queue limit.
+        runtime.executor.submit(
+            functools.partial(run_job, app.bot, runtime, job.id), force=True
+        )
+
+
+def _warm_up(configs: list[Config]) -> None:
+    """Load yt-dlp and the uploaders any route enables while the bot waits for links."""
+    try:
+        get_engine()
+    except Exception:
+        logging.exception("Failed to load yt-dlp")
+    preload(
+        dict.fromkeys(
+            name
+            for config in configs
+            if config.job_runner == "local"
+            for name in backends_for(config)
+        )
+    )
+    logging.info("Backends loaded; RSS %.0f MiB", metrics.process_rss_bytes() / 2**20)
+
+
+async def _post_init(app: Application) -> None:
+    runtimes: list[Runtime] = list(app.bot_data["runtimes"].values())
+    for runtime in runtimes:
+        runtime.scheduler.prune()
+        await runtime.executor.start()
+    for server in app.bot_data["http_servers"].values():
+        await server.start()
+    for runtime in runtimes:
+        # With JOB_RUNNER=workers the workers pick up unfinished jobs.
+        if runtime.config.job_runner == "local":
+            await _resume_unfinished_jobs(app, runtime)
+
+    startup = metrics.process_uptime_seconds()
+    metrics.STARTUP_SECONDS.set(startup)
+    logging.info(
+        "Ready after %.2fs; RSS %.0f MiB", startup, metrics.process_rss_bytes() / 2**20
+    )
+    runtimes[0].executor.spawn_blocking(_warm_up, [runtime.config for runtime in runtimes])
+
+
+async def _post_shutdown(app: Application) -> None:
+    runtimes: list[Runtime] = list(app.bot_data["runtimes"].values())
+    for server in app.bot_data["http_servers"].values():
+        await server.stop()
+    for runtime in runtimes:
+        await runtime.executor.stop()
+    await app.bot_data["status_edits"].close()
+    for runtime in runtimes:
+        runtime.store.close()
+
+
+def _http_server(app: Application, host: str, port: int) -> HttpServer:
+    """Return the local HTTP server for ``host:port``, shared by all its routes."""
+    servers: dict[tuple[str, int], HttpServer] = app.bot_data["http_servers"]
+    server = servers.get((host, port))
+    if server is None:
+        server = HttpServer(host, port)
+        servers[(host, port)] = server
+    return server
+
+
+def _polls_pending(runtimes: list[Runtime], platform: str) -> int:
+    return sum(runtime.poller.pending(platform) for runtime in runtimes)
+
+
+def _circuits_open(runtimes: list[Runtime], platform: str) -> int:
+    return sum(runtime.resilience.breaker(platform).is_open for runtime in runtimes)
+
+
+def bind_runtime_metrics(runtimes: list[Runtime]) -> None:
+    metrics.QUEUE_DEPTH.set_function(
+        lambda: sum(runtime.executor.queued for runtime in runtimes)
+    )
+    metrics.JOBS_RUNNING.set_function(
+        lambda: sum(runtime.executor.running for runtime in runtimes)
+    )
+    # Routes share one download cache.
+    metrics.DISK_RESERVED.set_function(lambda: runtimes[0].cache.reserved_bytes)
+    for platform in PLATFORM_NAMES:
+        metrics.POLLS_PENDING.set_function(
+            functools.partial(_polls_pending, runtimes, platform), platform=platform
+        )
+        metrics.CIRCUITS_OPEN.set_function(
+            functools.partial(_circuits_open, runtimes, platform), platform=platform
+        )
 
 
 def build_app(config: Config):
-    app = ApplicationBuilder().token(config.telegram_bot_token).build()
+    app = (
+        ApplicationBuilder()
+        .token(config.telegram_bot_token)
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
     app.bot_data["config"] = config
+    app.bot_data["http_servers"] = {}
+    app.bot_data["status_edits"] = EditThrottle(app.bot, config.status_edit_interval_seconds)
+
+    # One runtime per route, keyed by source channel.
+    runtimes: dict[int, Runtime] = {}
+    cache = None
+    for route in load_routes(config):
+        runtime = build_runtime(route.config, name=route.name, cache=cache)
+        cache = runtime.cache
+        runtimes[route.config.telegram_channel_id] = runtime
+    app.bot_data["runtimes"] = runtimes
+    if config.media_server_public_url:
+        media_http = _http_server(app, config.media_server_host, config.media_server_port)
+        media_server = MediaServer(
+            media_http,
+            Path(config.download_dir),
+            config.media_server_public_url,
+            (config.media_server_secret or secrets.token_hex(32)).encode(),
+        )
+        for runtime in runtimes.values():
+            runtime.media_server = media_server
+    for runtime in runtimes.values():
+        for platform, problem in platform_problems(runtime).items():
+            logging.warning(
+                "%s uploads of route %s will fail: %s",
+                PLATFORM_NAMES[platform],
+                runtime.name,
+                problem,
+            )
+    if config.telegram_mode == "webhook":
+        app.bot_data["webhook_secret"] = config.telegram_webhook_secret
+        TelegramWebhook(
+            _http_server(app, config.telegram_webhook_host, config.telegram_webhook_port),
+            app,
+            config.telegram_webhook_path,
+            app.bot_data["webhook_secret"],
+        )
+    if config.metrics_port:
+        metrics.MetricsEndpoint(_http_server(app, config.metrics_host, config.metrics_port))
+        bind_runtime_metrics(list(runtimes.values()))
 
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    app.add_handler(MessageHandler(filters.COMMAND, handle_queue))
     return app
@@ -1,18 +1,52 @@
 from __future__ import annotations
 
+import logging
 import math
+import mmap
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import ERRORS, STAGE_SECONDS, record_transfer
+from .resilience import backoff_delay
 
 INIT_URL = "https://open.tiktokapis.com/v2/post/publish/video/init/"
 STATUS_URL = "https://open.tiktokapis.com/v2/post/publish/status/fetch/"
 
+RETRIABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 32
+POOL_SIZE = 16
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
 
 class TikTokUploadError(RuntimeError):
-    pass
+    """A failed TikTok request; ``transient`` overrides the guess from ``status``."""
+
+    def __init__(
+        self, message: str, status: Optional[int] = None, transient: Optional[bool] = None
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.transient = transient
+
+
+def _session() -> requests.Session:
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _shared_session = session
+        return _shared_session
 
 
 def _auth_headers(access_token: str) -> dict[str, str]:
@@ -26,45 +60,132 @@ def _ensure_ok(response: requests.Response, context: str) -> dict[str, Any]:
     try:
         payload = response.json()
     except Exception as exc:
-        raise TikTokUploadError(f"{context}: invalid JSON response") from exc
+        raise TikTokUploadError(
+            f"{context}: invalid JSON response", status=response.status_code
+        ) from exc
 
     if response.status_code >= 400:
         message = payload.get("error", {}).get("message") or payload
-        raise TikTokUploadError(f"{context}: {message}")
+        raise TikTokUploadError(f"{context}: {message}", status=response.status_code)
 
     error = payload.get("error") or {}
     if error.get("code") not in (None, "ok"):
-        raise TikTokUploadError(f"{context}: {error.get('message') or error}")
+        raise TikTokUploadError(
+            f"{context}: {error.get('message') or error}",
+            transient=error.get("code") == "rate_limit_exceeded",
+        )
 
     return payload
 
 
-def _upload_file_to_url(upload_url: str, file_path: Path, chunk_size: int) -> None:
+def _put_chunk(
+    upload_url: str,
+    chunk: memoryview,
+    start: int,
+    end: int,
+    file_size: int,
+    max_retries: int,
+) -> None:
+    headers = {
+        "Content-Type": "video/mp4",
+        "Content-Length": str(len(chunk)),
+        "Content-Range": f"bytes {start}-{end}/{file_size}",
+    }
+    attempt = 0
+    while True:
+        try:
+            with STAGE_SECONDS.time(stage="upload_chunk", platform="tiktok"):
+                response = _session().put(upload_url, headers=headers, data=chunk, timeout=120)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            error: str = str(exc)
+            status = None
+        else:
+            if response.status_code < 400:
+                return
+            error = f"status {response.status_code}: {response.text}"
+            status = response.status_code
+            if status not in RETRIABLE_STATUS_CODES:
+                ERRORS.inc(stage="upload_chunk", platform="tiktok")
+                raise TikTokUploadError(f"TikTok chunk upload failed with {error}", status=status)
+        ERRORS.inc(stage="upload_chunk", platform="tiktok")
+
+        if attempt >= max_retries:
+            raise TikTokUploadError(
+                f"TikTok chunk bytes {start}-{end} failed after {attempt + 1} attempts: {error}",
+                status=status,
+                transient=True,
+            )
+        attempt += 1
+        delay = backoff_delay(attempt, MAX_BACKOFF_SECONDS)
+        logging.warning(
+            "TikTok chunk bytes %d-%d failed (%s), retry %d/%d in %.1fs",
+            start,
+            end,
+            error,
+            attempt,
+            max_retries,
+            delay,
+        )
+        time.sleep(delay)
+
+
+def _upload_file_to_url(
+    upload_url: str,
+    file_path: Path,
+    chunk_size: int,
+    *,
+    parallel_chunks: int = 1,
+    max_retries: int = 3,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> None:
+    """PUT ``file_path`` to ``upload_url`` in ``chunk_size`` ranges from a memory map."""
     file_size = file_path.stat().st_size
+    if file_size == 0:
+        raise TikTokUploadError("No video bytes read for TikTok upload chunk")
     total_chunks = max(1, math.ceil(file_size / chunk_size))
+    ranges = [
+        (index * chunk_size, min(file_size, (index + 1) * chunk_size) - 1)
+        for index in range(total_chunks)
+    ]
+
+    sent = 0
+    sent_lock = threading.Lock()
+
+    def send(view: memoryview, byte_range: tuple[int, int]) -> None:
+        nonlocal sent
+        start, end = byte_range
+        chunk = view[start : end + 1]
+        try:
+            _put_chunk(upload_url, chunk, start, end, file_size, max_retries)
+        finally:
+            chunk.release()
+        if progress:
+            with sent_lock:
+                sent += end - start + 1
+                progress(sent, file_size)
+
+    started = time.monotonic()
+    with file_path.open("rb") as source, mmap.mmap(
+        source.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped:
+        view = memoryview(mapped)
+        try:
+            if parallel_chunks <= 1:
+                for byte_range in ranges:
+                    send(view, byte_range)
+            else:
+                with ThreadPoolExecutor(
+                    max_workers=min(parallel_chunks, total_chunks),
+                    thread_name_prefix="tiktok-chunk",
+                ) as pool:
+                    # list() re-raises the first chunk failure.
+                    list(pool.map(lambda byte_range: send(view, byte_range), ranges))
+        finally:
+            view.release()
+    record_transfer("upload", "tiktok", file_size, time.monotonic() - started)
 
-    with file_path.open("rb") as source:
-        for index in range(total_chunks):
-            start = index * chunk_size
-            end = min(file_size, start + chunk_size) - 1
-            current_chunk_size = end - start + 1
-            chunk = source.read(current_chunk_size)
-            if not chunk:
-                raise TikTokUploadError("No video bytes read for TikTok upload chunk")
-
-            headers = {
-                "Content-Type": "video/mp4",
-                "Content-Length": str(len(chunk)),
-                "Content-Range": f"bytes {start}-{end}/{file_size}",
-            }
-            response = requests.put(upload_url, headers=headers, data=chunk, timeout=120)
-            if response.status_code >= 400:
-                raise TikTokUploadError(
-                    f"TikTok chunk upload failed with status {response.status_code}: {response.text}"
-                )
-
-
-def upload_video(
+
+def start_upload(
     *,
     file_path: Path,
     title: str,
@@ -74,8 +195,11 @@ def upload_video(
     disable_duet: bool,
     disable_stitch: bool,
     chunk_size: int = 5 * 1024 * 1024,
-    timeout_seconds: int = 120,
+    parallel_chunks: int = 1,
+    chunk_retries: int = 3,
+    progress: Optional[Callable[[int, int], None]] = None,
 ) -> str:
+    """Create the post and upload the video; return the ``publish_id`` to poll."""
     file_size = file_path.stat().st_size
     total_chunk_count = max(1, math.ceil(file_size / chunk_size))
 
@@ -95,7 +219,7 @@ def upload_video(
         },
     }
 
-    init_response = requests.post(
+    init_response = _session().post(
         INIT_URL,
         headers=_auth_headers(access_token),
         json=payload,
@@ -109,26 +233,32 @@ def upload_video(
     if not publish_id or not upload_url:
         raise TikTokUploadError("TikTok init response missing publish_id or upload_url")
 
-    _upload_file_to_url(upload_url, file_path, chunk_size)
-
-    deadline = time.time() + timeout_seconds
-    while time.time() < deadline:
-        status_response = requests.post(
-            STATUS_URL,
-            headers=_auth_headers(access_token),
-            json={"publish_id": publish_id},
-            timeout=30,
-        )
-        status_payload = _ensure_ok(status_response, "TikTok status check failed")
-        status_data = status_payload.get("data") or {}
-        status = (status_data.get("status") or "").upper()
+    _upload_file_to_url(
+        upload_url,
+        file_path,
+        chunk_size,
+        parallel_chunks=parallel_chunks,
+        max_retries=chunk_retries,
+        progress=progress,
+    )
+    return publish_id
 
-        if status in {"PUBLISHED", "SUCCESS"}:
-            return publish_id
-        if status in {"FAILED", "ERROR", "CANCELED", "CANCELLED"}:
-            fail_reason = status_data.get("fail_reason") or status
-            raise TikTokUploadError(f"TikTok publish failed: {fail_reason}")
 
-        time.sleep(3)
+def check_publish_status(access_token: str, publish_id: str) -> Optional[str]:
+    """Return ``publish_id`` once published, ``None`` while still processing."""
+    status_response = _session().post(
+        STATUS_URL,
+        headers=_auth_headers(access_token),
+        json={"publish_id": publish_id},
+        timeout=30,
+    )
+    status_payload = _ensure_ok(status_response, "TikTok status check failed")
+    status_data = status_payload.get("data") or {}
+    status = (status_data.get("status") or "").upper()
 
-    return publish_id
+    if status in {"PUBLISH_COMPLETE", "PUBLISHED", "SUCCESS"}:
+        return publish_id
+    if status in {"FAILED", "ERROR", "CANCELED", "CANCELLED"}:
+        fail_reason = status_data.get("fail_reason") or status
+        raise TikTokUploadError(f"TikTok publish failed: {fail_reason}")
+    return None
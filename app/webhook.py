@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import signal
+import sys
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from telegram import Update
+from telegram.ext import Application
+
+from .config import Config
+from .http_server import HttpServer, Request, Response
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+class TelegramWebhook:
+    """Queues Telegram updates posted to ``path`` with the secret token."""
+
+    def __init__(self, server: HttpServer, app: Application, path: str, secret: str) -> None:
+        self.app = app
+        self.path = path
+        self._secret = secret.encode()
+        server.route("POST", path, self.handle)
+
+    async def handle(self, request: Request) -> Response:
+        if request.path != self.path:
+            return Response(status=404, body=b"Not found")
+        token = request.headers.get(SECRET_HEADER, "").encode()
+        if not hmac.compare_digest(token, self._secret):
+            return Response(status=403, body=b"Forbidden")
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return Response(status=400, body=b"Invalid update")
+        if not isinstance(data, dict):
+            return Response(status=400, body=b"Invalid update")
+        try:
+            update = Update.de_json(data, self.app.bot)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return Response(status=400, body=b"Invalid update")
+        if update is None:
+            return Response(status=400, body=b"Invalid update")
+        self.app.update_queue.put_nowait(update)
+        return Response()
+
+
+async def run_webhook(app: Application, config: Config) -> None:
+    """Run ``app`` on webhook updates until SIGINT/SIGTERM."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    try:
+        await app.bot.set_webhook(
+            url=config.telegram_webhook_url.rstrip("/") + config.telegram_webhook_path,
+            secret_token=app.bot_data["webhook_secret"],
+            allowed_updates=Update.ALL_TYPES,
+        )
+        await app.start()
+        logging.info("Receiving Telegram updates by webhook on %s", config.telegram_webhook_path)
+        await stop.wait()
+        await app.stop()
+    finally:
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+def _load_updates(path: Path) -> list[dict]:
+    text = path.read_text()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # One update per line.
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+
+def replay(url: str, secret: str, paths: list[Path]) -> int:
+    """POST recorded update payloads to a running webhook; return the failure count."""
+    failures = 0
+    for path in paths:
+        for update in _load_updates(path):
+            request = urllib.request.Request(
+                url,
+                data=json.dumps(update).encode(),
+                headers={"Content-Type": "application/json", SECRET_HEADER: secret},
+                method="POST",
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    status = response.status
+            except urllib.error.HTTPError as exc:
+                status = exc.code
+            print(f"{path.name} update {update.get('update_id')}: {status}")
+            failures += status != 200
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Post recorded Telegram updates to the webhook.")
+    parser.add_argument("files", nargs="+", type=Path, help="JSON or JSON-lines update files")
+    parser.add_argument("--url", default="http://127.0.0.1:8081/telegram")
+    parser.add_argument("--secret", required=True, help="TELEGRAM_WEBHOOK_SECRET of the bot")
+    args = parser.parse_args(argv)
+    return 1 if replay(args.url, args.secret, args.files) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
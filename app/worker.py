@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import signal
+import socket
+import sys
+from pathlib import Path
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+from telegram import Bot
+
+from . import metrics
+from .config import Config
+from .downloader import get_engine
+from .http_server import HttpServer
+from .job_store import JobRecord
+from .media_server import MediaServer
+from .pipeline import PLATFORM_NAMES, Runtime, build_runtime, platform_problems, process_short
+from .platforms import backends_for, preload
+from .progress import EditThrottle, StatusMessage
+from .routes import load_routes
+from .scheduler import UploadDeferred
+from .telegram_bot import STATUS_HEADER, bind_runtime_metrics, run_job
+
+# How often an idle worker looks for new jobs.
+CLAIM_POLL_SECONDS = 2
+
+
+class Worker:
+    """Runs jobs from the routes' job databases, claimed by lease."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        runtimes: list[Runtime],
+        throttle: EditThrottle,
+        owner: str,
+        lease_seconds: int,
+    ) -> None:
+        self.bot = bot
+        self.runtimes = runtimes
+        self.throttle = throttle
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        logging.info("Worker %s waiting for jobs", self.owner)
+        while not self._stopping:
+            self._wakeup.clear()
+            self._claim()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), CLAIM_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim(self) -> None:
+        for runtime in self.runtimes:
+            executor = runtime.executor
+            while executor.running + executor.queued < executor.concurrency:
+                job_id = runtime.store.claim_job(self.owner, self.lease_seconds)
+                if job_id is None:
+                    break
+                logging.info("Claimed job %s of route %s", job_id, runtime.name)
+                executor.submit(functools.partial(self._run, runtime, job_id), force=True)
+
+    async def _run(self, runtime: Runtime, job_id: int) -> None:
+        deferred_until: Optional[float] = None
+
+        def defer(until: float) -> None:
+            nonlocal deferred_until
+            deferred_until = until
+
+        job = runtime.store.get_job(job_id)
+        work = asyncio.ensure_future(self._process(runtime, job, defer))
+        lease = asyncio.ensure_future(self._hold_lease(runtime, job_id))
+        try:
+            await asyncio.wait({work, lease}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            lease.cancel()
+            if not work.done():
+                work.cancel()
+            runtime.store.release_lease(job_id, self.owner, deferred_until)
+            self._wakeup.set()
+        if work.done() and not work.cancelled():
+            work.result()
+
+    async def _process(
+        self, runtime: Runtime, job: Optional[JobRecord], defer: Callable[[float], None]
+    ) -> None:
+        if job is None:
+            return
+        if job.quiet:
+            try:
+                await process_short(runtime, job.id)
+            except UploadDeferred as deferred:
+                defer(deferred.until)
+            except Exception:
+                logging.exception("Failed to process job %s", job.id)
+            return
+
+        status = None
+        if job.status_message_id is not None:
+            status = StatusMessage(
+                self.throttle, runtime.config.telegram_channel_id, STATUS_HEADER, PLATFORM_NAMES
+            )
+            status.attach(job.status_message_id)
+        await run_job(self.bot, runtime, job.id, status=status, defer=defer)
+
+    async def _hold_lease(self, runtime: Runtime, job_id: int) -> None:
+        """Renew the lease on ``job_id`` until cancelled; return once it is lost."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not runtime.store.renew_lease(job_id, self.owner, self.lease_seconds):
+                logging.warning("Lost the lease on job %s; stopping it here", job_id)
+                return
+
+
+def _warm_up(configs: list[Config]) -> None:
+    try:
+        get_engine()
+    except Exception:
+        logging.exception("Failed to load yt-dlp")
+    preload(dict.fromkeys(name for config in configs for name in backends_for(config)))
+
+
+async def run_worker(config: Config, owner: str) -> None:
+    """Run jobs as worker ``owner`` until SIGINT/SIGTERM."""
+    bot = Bot(config.telegram_bot_token)
+    await bot.initialize()
+
+    runtimes: list[Runtime] = []
+    cache = None
+    for route in load_routes(config):
+        runtime = build_runtime(route.config, name=route.name, cache=cache)
+        cache = runtime.cache
+        runtimes.append(runtime)
+    if config.media_server_public_url:
+        # The bot process serves the download directory; workers only sign URLs.
+        media_server = MediaServer(
+            None,
+            Path(config.download_dir),
+            config.media_server_public_url,
+            config.media_server_secret.encode(),
+        )
+        for runtime in runtimes:
+            runtime.media_server = media_server
+    for runtime in runtimes:
+        for platform, problem in platform_problems(runtime).items():
+            logging.warning(
+                "%s uploads of route %s will fail: %s",
+                PLATFORM_NAMES[platform],
+                runtime.name,
+                problem,
+            )
+
+    server = None
+    if config.metrics_port:
+        server = HttpServer(config.metrics_host, config.metrics_port)
+        metrics.MetricsEndpoint(server)
+        bind_runtime_metrics(runtimes)
+
+    throttle = EditThrottle(bot, config.status_edit_interval_seconds)
+    worker = Worker(bot, runtimes, throttle, owner, config.job_lease_seconds)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stop)
+
+    for runtime in runtimes:
+        await runtime.executor.start()
+    if server is not None:
+        await server.start()
+    runtimes[0].executor.spawn_blocking(_warm_up, [runtime.config for runtime in runtimes])
+    try:
+        await worker.run()
+    finally:
+        # Cancelled jobs release their leases for another worker.
+        for runtime in runtimes:
+            await runtime.executor.stop()
+        await throttle.close()
+        if server is not None:
+            await server.stop()
+        for runtime in runtimes:
+            runtime.store.close()
+        await bot.shutdown()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run upload jobs queued by the bot.")
+    parser.add_argument(
+        "--id",
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="name this worker holds job leases under (default: host-pid)",
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(name)s %(message)s", level=logging.INFO
+    )
+    config = Config.from_env()
+    if config.job_runner != "workers":
+        parser.error("set JOB_RUNNER=workers for the bot and its workers")
+    asyncio.run(run_worker(config, args.id))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,99 @@
 from __future__ import annotations
 
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit, urlunsplit
 
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, build_http
+
+from .metrics import ERRORS, STAGE_SECONDS, record_transfer
+from .resilience import backoff_delay
 
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+# Sends uploads to another host, e.g. a local stand-in; None uses Google's.
+API_ROOT: Optional[str] = None
+
+# Refresh the access token this long before it expires.
+REFRESH_MARGIN_SECONDS = 300
+# Poll interval for tokens without a known expiry, and backoff after a failed refresh.
+REFRESH_IDLE_SECONDS = 600
+REFRESH_RETRY_SECONDS = 60
+
+# Resumable upload chunks must be a multiple of 256 KiB.
+CHUNK_ALIGNMENT = 256 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+RETRIABLE_STATUS_CODES = {500, 502, 503, 504}
+RETRIABLE_EXCEPTIONS = (httplib2.HttpLib2Error, OSError)
+MAX_BACKOFF_SECONDS = 64
+
+
+class YouTubeUploadError(RuntimeError):
+    pass
+
+
+def _align_chunk_size(chunk_size: int) -> int:
+    chunks = max(1, -(-chunk_size // CHUNK_ALIGNMENT))
+    return chunks * CHUNK_ALIGNMENT
+
+
+def _load_session(session_path: Optional[Path], file_size: int) -> Optional[str]:
+    if session_path is None or not session_path.exists():
+        return None
+    try:
+        data = json.loads(session_path.read_text())
+    except (OSError, ValueError):
+        return None
+    if data.get("size") != file_size:
+        return None
+    return data.get("uri")
+
+
+def _save_session(session_path: Optional[Path], file_size: int, uri: str) -> None:
+    if session_path is None:
+        return
+    session_path.parent.mkdir(parents=True, exist_ok=True)
+    session_path.write_text(json.dumps({"size": file_size, "uri": uri}))
+
+
+def _session_status(http: AuthorizedHttp, uri: str, file_size: int) -> tuple[int, Optional[dict]]:
+    """Return ``(confirmed_bytes, None)``, or ``(file_size, video)`` once complete."""
+    resp, content = http.request(
+        uri, "PUT", headers={"Content-Length": "0", "Content-Range": f"bytes */{file_size}"}
+    )
+    if resp.status in (200, 201):
+        return file_size, json.loads(content)
+    if resp.status == 308:
+        # Confirmed bytes come as "bytes=0-<last>"; no header means none.
+        match = re.fullmatch(r"bytes=0-(\d+)", resp.get("range", ""))
+        return (int(match.group(1)) + 1 if match else 0), None
+    raise HttpError(resp, content, uri=uri)
+
+
+def _is_retriable(exc: Exception) -> bool:
+    if isinstance(exc, HttpError):
+        return exc.resp.status in RETRIABLE_STATUS_CODES
+    return isinstance(exc, RETRIABLE_EXCEPTIONS)
+
+
+def _reroot(uri: str, api_root: str) -> str:
+    root = urlsplit(api_root)
+    parts = urlsplit(uri)
+    return urlunsplit(
+        (root.scheme, root.netloc, root.path.rstrip("/") + parts.path, parts.query, "")
+    )
 
 
 def _load_credentials(
@@ -29,10 +113,221 @@ def _load_credentials(
         else:
             creds = flow.run_local_server(port=0)
 
-    token_file.write_text(creds.to_json())
     return creds
 
 
+class YouTubeUploader:
+    """Keeps YouTube credentials, refreshed in the background, and the API client."""
+
+    def __init__(self, client_secrets_path: str, token_path: str, oauth_flow: str) -> None:
+        self.client_secrets_path = client_secrets_path
+        self.token_path = token_path
+        self.oauth_flow = oauth_flow
+        self._lock = threading.RLock()
+        self._creds: Optional[Credentials] = None
+        self._saved_token: Optional[str] = None
+        self._service: Any = None
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def credentials(self) -> Credentials:
+        with self._lock:
+            if self._creds is None:
+                token_file = Path(self.token_path)
+                if token_file.exists():
+                    self._saved_token = token_file.read_text()
+                self._creds = _load_credentials(
+                    self.client_secrets_path, self.token_path, self.oauth_flow
+                )
+                self._persist()
+                self._start_refresher()
+            elif not self._creds.valid and self._creds.refresh_token:
+                self._refresh()
+            return self._creds
+
+    def service(self) -> Any:
+        with self._lock:
+            if self._service is None:
+                self._service = build(
+                    "youtube",
+                    "v3",
+                    credentials=self.credentials(),
+                    static_discovery=True,
+                    cache_discovery=False,
+                )
+            return self._service
+
+    def http(self) -> AuthorizedHttp:
+        """Return this thread's authorized connection."""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            # build_http() keeps httplib2 from following the 308 of each chunk.
+            http = AuthorizedHttp(self.credentials(), http=build_http())
+            self._local.http = http
+        return http
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def upload(
+        self,
+        *,
+        file_path: Path,
+        title: str,
+        description: str,
+        privacy_status: str,
+        category_id: str,
+        made_for_kids: bool,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_retries: int = 5,
+        session_path: Optional[Path] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> str:
+        """Upload ``file_path`` in resumable chunks and return the video id."""
+        youtube = self.service()
+        # Refreshes inline if the background refresh fell behind.
+        self.credentials()
+
+        body = {
+            "snippet": {
+                "title": title,
+                "description": description,
+                "categoryId": category_id,
+            },
+            "status": {
+                "privacyStatus": privacy_status,
+                "selfDeclaredMadeForKids": made_for_kids,
+            },
+        }
+
+        file_size = file_path.stat().st_size
+        media = MediaFileUpload(
+            str(file_path), chunksize=_align_chunk_size(chunk_size), resumable=True
+        )
+        request = youtube.videos().insert(part=",".join(body.keys()), body=body, media_body=media)
+        if API_ROOT:
+            request.uri = _reroot(request.uri, API_ROOT)
+
+        http = self.http()
+        response = None
+        session_uri = _load_session(session_path, file_size)
+        if session_uri:
+            try:
+                confirmed, response = _session_status(http, session_uri, file_size)
+            except HttpError as exc:
+                if exc.resp.status not in (404, 410):
+                    raise
+                logging.warning("YouTube upload session expired, restarting upload")
+                session_uri = None
+            else:
+                logging.info(
+                    "Resuming YouTube upload of %s at byte %d/%d", file_path, confirmed, file_size
+                )
+                request.resumable_uri = session_uri
+                request.resumable_progress = confirmed
+
+        attempt = 0
+        started = time.monotonic()
+        while response is None:
+            try:
+                with STAGE_SECONDS.time(stage="upload_chunk", platform="youtube"):
+                    status, response = request.next_chunk(http=http)
+            except Exception as exc:
+                ERRORS.inc(stage="upload_chunk", platform="youtube")
+                if isinstance(exc, HttpError) and session_uri and exc.resp.status in (404, 410):
+                    # The stored session expired; start a new one.
+                    logging.warning("YouTube upload session expired, restarting upload")
+                    session_uri = None
+                    request.resumable_uri = None
+                    request.resumable_progress = 0
+                    continue
+                if not _is_retriable(exc) or attempt >= max_retries:
+                    raise
+                attempt += 1
+                delay = backoff_delay(attempt, MAX_BACKOFF_SECONDS)
+                logging.warning(
+                    "YouTube chunk failed (%s), retry %d/%d in %.1fs",
+                    exc,
+                    attempt,
+                    max_retries,
+                    delay,
+                )
+                time.sleep(delay)
+                continue
+
+            attempt = 0
+            if request.resumable_uri and request.resumable_uri != session_uri:
+                session_uri = request.resumable_uri
+                _save_session(session_path, file_size, session_uri)
+            if progress:
+                confirmed = file_size if response is not None else status.resumable_progress
+                progress(confirmed, file_size)
+
+        if session_path is not None:
+            session_path.unlink(missing_ok=True)
+        # Includes bytes confirmed by an earlier run when resuming.
+        record_transfer("upload", "youtube", file_size, time.monotonic() - started)
+
+        video_id = response.get("id")
+        if not video_id:
+            raise YouTubeUploadError(f"YouTube upload returned no video id: {response}")
+        return video_id
+
+    def _refresh(self) -> None:
+        with self._lock:
+            self._creds.refresh(Request())
+            self._persist()
+
+    def _persist(self) -> None:
+        token_json = self._creds.to_json()
+        if token_json == self._saved_token:
+            return
+        Path(self.token_path).write_text(token_json)
+        self._saved_token = token_json
+
+    def _start_refresher(self) -> None:
+        if self._refresher is not None or not self._creds.refresh_token:
+            return
+        self._refresher = threading.Thread(
+            target=self._refresh_loop, name="youtube-token-refresh", daemon=True
+        )
+        self._refresher.start()
+
+    def _seconds_until_refresh(self) -> float:
+        expiry = self._creds.expiry
+        if expiry is None:
+            return REFRESH_IDLE_SECONDS
+        # google-auth keeps expiry as a naive UTC datetime.
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return max(0.0, (expiry - now).total_seconds() - REFRESH_MARGIN_SECONDS)
+
+    def _refresh_loop(self) -> None:
+        delay = self._seconds_until_refresh()
+        while not self._stop.wait(delay):
+            try:
+                if self._seconds_until_refresh() <= 0:
+                    self._refresh()
+                delay = max(1.0, self._seconds_until_refresh())
+            except Exception:
+                logging.exception("YouTube token refresh failed")
+                delay = REFRESH_RETRY_SECONDS
+
+
+_uploaders: dict[tuple[str, str, str], YouTubeUploader] = {}
+_uploaders_lock = threading.Lock()
+
+
+def get_uploader(client_secrets_path: str, token_path: str, oauth_flow: str) -> YouTubeUploader:
+    key = (client_secrets_path, token_path, oauth_flow)
+    with _uploaders_lock:
+        uploader = _uploaders.get(key)
+        if uploader is None:
+            uploader = YouTubeUploader(client_secrets_path, token_path, oauth_flow)
+            _uploaders[key] = uploader
+        return uploader
+
+
 def upload_short(
     *,
     file_path: Path,
@@ -44,29 +339,21 @@ def upload_short(
     client_secrets_path: str,
     token_path: str,
     oauth_flow: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_retries: int = 5,
+    session_path: Optional[Path] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
 ) -> str:
-    creds = _load_credentials(client_secrets_path, token_path, oauth_flow)
-    youtube = build("youtube", "v3", credentials=creds)
-
-    body = {
-        "snippet": {
-            "title": title,
-            "description": description,
-            "categoryId": category_id,
-        },
-        "status": {
-            "privacyStatus": privacy_status,
-            "selfDeclaredMadeForKids": made_for_kids,
-        },
-    }
-
-    media = MediaFileUpload(str(file_path), chunksize=-1, resumable=True)
-    request = youtube.videos().insert(part=",".join(body.keys()), body=body, media_body=media)
-
-    response = None
-    while response is None:
-        status, response = request.next_chunk()
-        if status:
-            pass
-
-    return response.get("id")
+    uploader = get_uploader(client_secrets_path, token_path, oauth_flow)
+    return uploader.upload(
+        file_path=file_path,
+        title=title,
+        description=description,
+        privacy_status=privacy_status,
+        category_id=category_id,
+        made_for_kids=made_for_kids,
+        chunk_size=chunk_size,
+        max_retries=max_retries,
+        session_path=session_path,
+        progress=progress,
+    )
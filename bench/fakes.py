@@ -0,0 +1,251 @@
+"""Local stand-ins for YouTube, TikTok and the Instagram Graph API.
+
+Each fake speaks just enough of the real protocol for the bot's uploaders:
+TikTok's init/chunk PUT/status flow, Graph's container/status/publish flow
+(fetching the video from the URL it is given, like Graph does), YouTube's
+resumable upload protocol, and a plain file origin yt-dlp can download
+from. All of them run on one :class:`app.http_server.HttpServer` in a
+background thread with its own event loop, so the bot under test keeps its
+event loop to itself.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from app.http_server import HttpServer, Request, Response
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+def _json(payload: dict, status: int = 200) -> Response:
+    return Response(
+        status=status,
+        body=json.dumps(payload).encode(),
+        content_type="application/json; charset=utf-8",
+    )
+
+
+@dataclass
+class _Upload:
+    size: int
+    received: int = 0
+    finished_at: Optional[float] = None
+
+
+@dataclass
+class FakeStats:
+    requests: int = 0
+    bytes_received: int = 0
+    by_route: dict[str, int] = field(default_factory=dict)
+
+
+class FakePlatforms:
+    """All fake endpoints, served from ``base_url``.
+
+    ``latency`` is added to every response; ``processing_seconds`` is how
+    long TikTok and Graph report a post as still processing after its bytes
+    arrived.
+    """
+
+    def __init__(
+        self,
+        source_file: Path,
+        *,
+        latency: float = 0.0,
+        processing_seconds: float = 1.0,
+        host: str = "127.0.0.1",
+    ) -> None:
+        self.source_file = source_file
+        self.latency = latency
+        self.processing_seconds = processing_seconds
+        self.stats = FakeStats()
+        self._ids = itertools.count(1)
+        self._tiktok: dict[str, _Upload] = {}
+        self._graph: dict[str, Optional[float]] = {}
+        self._youtube: dict[str, _Upload] = {}
+        self._server = HttpServer(host, 0, max_body_bytes=MAX_BODY_BYTES)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._routes()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self._server.host}:{self._server.port}"
+
+    def start(self) -> None:
+        started = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._server.start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="bench-fakes", daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._server.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def _routes(self) -> None:
+        self._route("GET", "/source/", self._source)
+        self._route("POST", "/tiktok/init", self._tiktok_init)
+        self._route("PUT", "/tiktok/upload/", self._tiktok_chunk)
+        self._route("POST", "/tiktok/status", self._tiktok_status)
+        self._route("POST", "/graph/", self._graph_post)
+        self._route("GET", "/graph/", self._graph_status)
+        self._route("POST", "/youtube/", self._youtube_start)
+        self._route("PUT", "/youtube-session/", self._youtube_chunk)
+
+    def _route(self, method: str, prefix: str, handler) -> None:
+        async def wrapped(request: Request) -> Response:
+            self.stats.requests += 1
+            self.stats.bytes_received += len(request.body)
+            self.stats.by_route[prefix] = self.stats.by_route.get(prefix, 0) + 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return await handler(request)
+
+        self._server.route(method, prefix, wrapped)
+
+    def _next_id(self, prefix: str) -> str:
+        return f"{prefix}{next(self._ids)}"
+
+    # yt-dlp source -----------------------------------------------------------
+
+    async def _source(self, request: Request) -> Response:
+        size = self.source_file.stat().st_size
+        range_header = request.headers.get("range", "")
+        start = 0
+        if range_header.startswith("bytes=") and range_header[6:].split("-")[0].isdigit():
+            start = min(int(range_header[6:].split("-")[0]), size)
+        if start:
+            return Response(
+                status=206,
+                content_type="video/mp4",
+                headers={
+                    "Accept-Ranges": "bytes",
+                    "Content-Range": f"bytes {start}-{size - 1}/{size}",
+                },
+                file=(self.source_file, start, size - start),
+            )
+        return Response(
+            content_type="video/mp4",
+            headers={"Accept-Ranges": "bytes"},
+            file=(self.source_file, 0, size),
+        )
+
+    # TikTok ------------------------------------------------------------------
+
+    async def _tiktok_init(self, request: Request) -> Response:
+        source_info = json.loads(request.body)["source_info"]
+        publish_id = self._next_id("tiktok-")
+        self._tiktok[publish_id] = _Upload(size=int(source_info["video_size"]))
+        return _json(
+            {
+                "data": {
+                    "publish_id": publish_id,
+                    "upload_url": f"{self.base_url}/tiktok/upload/{publish_id}",
+                },
+                "error": {"code": "ok"},
+            }
+        )
+
+    async def _tiktok_chunk(self, request: Request) -> Response:
+        upload = self._tiktok.get(request.path.rsplit("/", 1)[-1])
+        if upload is None:
+            return Response(status=404)
+        upload.received += len(request.body)
+        if upload.received >= upload.size and upload.finished_at is None:
+            upload.finished_at = time.monotonic()
+        return Response(status=201 if upload.finished_at else 206)
+
+    async def _tiktok_status(self, request: Request) -> Response:
+        upload = self._tiktok.get(json.loads(request.body).get("publish_id"))
+        if upload is None:
+            return _json({"error": {"code": "invalid_params", "message": "unknown"}}, 400)
+        status = "PROCESSING_UPLOAD"
+        if (
+            upload.finished_at is not None
+            and time.monotonic() - upload.finished_at >= self.processing_seconds
+        ):
+            status = "PUBLISH_COMPLETE"
+        return _json({"data": {"status": status}, "error": {"code": "ok"}})
+
+    # Instagram Graph ---------------------------------------------------------
+
+    async def _graph_post(self, request: Request) -> Response:
+        form = dict(parse_qsl(request.body.decode()))
+        if request.path.endswith("/media"):
+            creation_id = self._next_id("container-")
+            self._graph[creation_id] = None
+            asyncio.ensure_future(self._graph_fetch(creation_id, form["video_url"]))
+            return _json({"id": creation_id})
+        if request.path.endswith("/media_publish"):
+            if self._graph.get(form.get("creation_id")) is None:
+                return _json({"error": {"message": "media not ready"}}, 400)
+            return _json({"id": self._next_id("media-")})
+        return _json({"error": {"message": "unsupported"}}, 404)
+
+    async def _graph_fetch(self, creation_id: str, video_url: str) -> None:
+        # Graph downloads the video from the URL the bot handed it.
+        loop = asyncio.get_running_loop()
+        body = await loop.run_in_executor(
+            None, lambda: urllib.request.urlopen(video_url, timeout=60).read()
+        )
+        self.stats.bytes_received += len(body)
+        self._graph[creation_id] = time.monotonic()
+
+    async def _graph_status(self, request: Request) -> Response:
+        creation_id = request.path.rsplit("/", 1)[-1]
+        if creation_id not in self._graph:
+            return _json({"error": {"message": "unknown container"}}, 404)
+        fetched_at = self._graph[creation_id]
+        status = "IN_PROGRESS"
+        if fetched_at is not None and time.monotonic() - fetched_at >= self.processing_seconds:
+            status = "FINISHED"
+        return _json({"status_code": status})
+
+    # YouTube resumable upload --------------------------------------------------
+
+    async def _youtube_start(self, request: Request) -> Response:
+        session_id = self._next_id("session-")
+        self._youtube[session_id] = _Upload(
+            size=int(request.headers.get("x-upload-content-length") or 0)
+        )
+        return Response(
+            headers={"Location": f"{self.base_url}/youtube-session/{session_id}"}
+        )
+
+    async def _youtube_chunk(self, request: Request) -> Response:
+        upload = self._youtube.get(request.path.rsplit("/", 1)[-1])
+        if upload is None:
+            return Response(status=404)
+        content_range = request.headers.get("content-range", "")
+        if content_range.startswith("bytes */"):
+            # Status query after an interrupted chunk.
+            pass
+        else:
+            upload.size = int(content_range.rsplit("/", 1)[-1]) or upload.size
+            start = int(content_range.split(" ", 1)[1].split("-", 1)[0])
+            upload.received = start + len(request.body)
+        if upload.received >= upload.size:
+            return _json({"id": self._next_id("yt-"), "kind": "youtube#video"})
+        headers = {"Range": f"bytes=0-{upload.received - 1}"} if upload.received else {}
+        return Response(status=308, headers=headers)
@@ -0,0 +1,287 @@
+"""Drive the job pipeline against local fakes and report latency, throughput and memory.
+
+Usage::
+
+    python -m bench.run --jobs 20 --rate 2 --size-mb 8 --platforms youtube,tiktok,instagram
+
+Every job goes through the same path as a posted link: ``process_short``
+downloads the video with yt-dlp from the fake origin, then uploads it to
+the fake platforms in parallel. Instagram uses the Graph method with the
+built-in media server. Nothing leaves the machine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import json
+import math
+import os
+import random
+import resource
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app import instagram_graph, poller, tiktok, youtube
+from app.config import Config
+from app.http_server import HttpServer
+from app.media_server import MediaServer
+from app.metrics import ERRORS, STAGE_SECONDS, process_rss_bytes
+from app.pipeline import build_runtime, process_short
+
+from .fakes import FakePlatforms
+
+WRITE_BLOCK = 1024 * 1024
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=10, help="number of jobs to run")
+    parser.add_argument("--rate", type=float, default=1.0, help="job arrivals per second")
+    parser.add_argument(
+        "--poisson", action="store_true", help="exponential inter-arrival times instead of fixed"
+    )
+    parser.add_argument("--size-mb", type=float, default=8.0, help="video size in MiB")
+    parser.add_argument("--platforms", default="youtube,tiktok,instagram")
+    parser.add_argument("--concurrency", type=int, default=2, help="JOB_CONCURRENCY")
+    parser.add_argument("--queue-size", type=int, default=100, help="JOB_QUEUE_SIZE")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every fake response")
+    parser.add_argument(
+        "--processing-seconds", type=float, default=1.0, help="TikTok/Graph processing time"
+    )
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="first status poll delay")
+    parser.add_argument("--workdir", help="keep files here instead of a temp dir")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def _write_source(path: Path, size: int) -> None:
+    with path.open("wb") as target:
+        remaining = size
+        while remaining > 0:
+            block = min(WRITE_BLOCK, remaining)
+            target.write(os.urandom(block))
+            remaining -= block
+
+
+def _write_youtube_token(path: Path) -> None:
+    # Valid far into the future, so the uploader never tries to refresh it.
+    path.write_text(
+        json.dumps(
+            {
+                "token": "bench",
+                "refresh_token": "bench",
+                "client_id": "bench",
+                "client_secret": "bench",
+                "token_uri": "https://oauth2.googleapis.com/token",
+                "expiry": "2099-01-01T00:00:00Z",
+            }
+        )
+    )
+
+
+def _configure(args: argparse.Namespace, workdir: Path, fakes: FakePlatforms) -> Config:
+    platforms = set(args.platforms.split(","))
+    token_path = workdir / "token.json"
+    _write_youtube_token(token_path)
+
+    os.environ.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "bench",
+            "TELEGRAM_CHANNEL_ID": "0",
+            "ENABLE_YOUTUBE_UPLOAD": str("youtube" in platforms),
+            "ENABLE_TIKTOK_UPLOAD": str("tiktok" in platforms),
+            "ENABLE_INSTAGRAM_UPLOAD": str("instagram" in platforms),
+            "YOUTUBE_TOKEN_PATH": str(token_path),
+            "TIKTOK_ACCESS_TOKEN": "bench",
+            "INSTAGRAM_UPLOAD_METHOD": "graph",
+            "INSTAGRAM_GRAPH_ACCESS_TOKEN": "bench",
+            "INSTAGRAM_GRAPH_IG_USER_ID": "bench",
+            "MEDIA_SERVER_PUBLIC_URL": "",
+            "DOWNLOAD_DIR": str(workdir / "downloads"),
+            "JOB_DB_PATH": str(workdir / "jobs.sqlite3"),
+            "ALLOW_DUPLICATE_UPLOADS": "true",
+            "JOB_CONCURRENCY": str(args.concurrency),
+            "JOB_QUEUE_SIZE": str(args.queue_size),
+            "YOUTUBE_DAILY_QUOTA": "0",
+            "TIKTOK_DAILY_UPLOADS": "0",
+            "INSTAGRAM_DAILY_UPLOADS": "0",
+        }
+    )
+    os.environ.pop("YTDLP_COOKIES_PATH", None)
+
+    tiktok.INIT_URL = f"{fakes.base_url}/tiktok/init"
+    tiktok.STATUS_URL = f"{fakes.base_url}/tiktok/status"
+    instagram_graph.GRAPH_BASE_URL = f"{fakes.base_url}/graph"
+    youtube.API_ROOT = f"{fakes.base_url}/youtube"
+    poller.INITIAL_DELAY_SECONDS = args.poll_interval
+    poller.MAX_DELAY_SECONDS = max(args.poll_interval, 2.0)
+    return Config.from_env()
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile.
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def _sample_rss(samples: list[int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        samples.append(process_rss_bytes())
+        try:
+            await asyncio.wait_for(stop.wait(), 0.2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _drive(args: argparse.Namespace, config: Config, fakes: FakePlatforms) -> dict:
+    runtime = build_runtime(config)
+    media_http = HttpServer("127.0.0.1", 0)
+    await media_http.start()
+    runtime.media_server = MediaServer(
+        media_http,
+        Path(config.download_dir),
+        f"http://127.0.0.1:{media_http.port}",
+        secrets.token_bytes(32),
+    )
+    await runtime.executor.start()
+
+    latencies: list[float] = []
+    failures: list[str] = []
+    done = asyncio.Event()
+    finished = 0
+    rss_samples: list[int] = []
+    stop_sampling = asyncio.Event()
+    sampler = asyncio.ensure_future(_sample_rss(rss_samples, stop_sampling))
+
+    async def run_job(job_id: int, arrived: float) -> None:
+        nonlocal finished
+        try:
+            _, job_failures = await process_short(runtime, job_id)
+            failures.extend(job_failures)
+            latencies.append(time.monotonic() - arrived)
+        except Exception as exc:
+            failures.append(str(exc))
+        finally:
+            finished += 1
+            if finished == args.jobs:
+                done.set()
+
+    started = time.monotonic()
+    for index in range(args.jobs):
+        video_id = f"bench{index}"
+        job_id = runtime.store.create_job(f"{fakes.base_url}/source/{video_id}.mp4", video_id)
+        arrived = time.monotonic()
+        await runtime.executor.submit_when_ready(functools.partial(run_job, job_id, arrived))
+        interval = 1 / args.rate if args.rate > 0 else 0
+        if args.poisson and interval:
+            interval = random.expovariate(args.rate)
+        await asyncio.sleep(interval)
+    await done.wait()
+    elapsed = time.monotonic() - started
+
+    stop_sampling.set()
+    await sampler
+    await runtime.executor.stop()
+    await media_http.stop()
+    runtime.store.close()
+
+    platforms = len(args.platforms.split(","))
+    size = int(args.size_mb * 1024 * 1024)
+    return {
+        "jobs": args.jobs,
+        "succeeded": len(latencies),
+        "failures": failures,
+        "elapsed_seconds": elapsed,
+        "jobs_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "upload_mib_per_second": len(latencies) * platforms * size / elapsed / 2**20
+        if elapsed
+        else 0.0,
+        "latency_seconds": {
+            "p50": _percentile(latencies, 50),
+            "p90": _percentile(latencies, 90),
+            "p99": _percentile(latencies, 99),
+            "max": max(latencies, default=0.0),
+        },
+        "rss_mib": {
+            "start": rss_samples[0] / 2**20 if rss_samples else 0.0,
+            "peak": max(rss_samples, default=0) / 2**20,
+            "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "stages": {
+            "/".join(part for part in key if part): {
+                "count": count,
+                "mean_seconds": total / count if count else 0.0,
+            }
+            for key, (count, total) in sorted(STAGE_SECONDS.summary().items())
+        },
+        "errors": {"/".join(key): value for key, value in sorted(ERRORS.summary().items())},
+        "fake_requests": fakes.stats.by_route,
+    }
+
+
+def _print_report(report: dict) -> None:
+    latency = report["latency_seconds"]
+    rss = report["rss_mib"]
+    print(f"jobs: {report['succeeded']}/{report['jobs']} succeeded in {report['elapsed_seconds']:.1f}s")
+    print(
+        f"throughput: {report['jobs_per_second']:.2f} jobs/s, "
+        f"{report['upload_mib_per_second']:.1f} MiB/s uploaded"
+    )
+    print(
+        f"latency: p50 {latency['p50']:.2f}s  p90 {latency['p90']:.2f}s  "
+        f"p99 {latency['p99']:.2f}s  max {latency['max']:.2f}s"
+    )
+    print(
+        f"memory: rss {rss['start']:.0f} MiB at start, {rss['peak']:.0f} MiB peak "
+        f"(process max {rss['max_rss']:.0f} MiB, includes the fakes)"
+    )
+    print("stages:")
+    for name, stage in report["stages"].items():
+        print(f"  {name:<28} {stage['count']:>6}  mean {stage['mean_seconds']:.3f}s")
+    if report["errors"]:
+        print("errors:")
+        for name, count in report["errors"].items():
+            print(f"  {name:<28} {count:>6.0f}")
+    for failure in report["failures"][:10]:
+        print(f"failed: {failure}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="repost-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    source_file = workdir / "source.mp4"
+    _write_source(source_file, int(args.size_mb * 1024 * 1024))
+
+    fakes = FakePlatforms(
+        source_file,
+        latency=args.latency_ms / 1000,
+        processing_seconds=args.processing_seconds,
+    )
+    fakes.start()
+    try:
+        config = _configure(args, workdir, fakes)
+        report = asyncio.run(_drive(args, config, fakes))
+    finally:
+        fakes.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 0 if report["succeeded"] == report["jobs"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())